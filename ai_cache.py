@@ -0,0 +1,138 @@
+"""Two-tier cache for AI-generated courses and career paths.
+
+Generating a course can take over a minute, and popular queries are asked
+again and again. Responses are keyed on the endpoint, the model, the prompt
+template version and the normalized query. A small in-process LRU sits in
+front of the ``ai_response_cache`` table in the SQLite Cloud store, so a
+repeat query is answered from memory when possible and from a single
+indexed lookup otherwise.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+CREATE_CACHE_TABLE = """
+    CREATE TABLE IF NOT EXISTS ai_response_cache (
+        cache_key TEXT PRIMARY KEY,
+        endpoint TEXT NOT NULL,
+        query TEXT NOT NULL,
+        title TEXT,
+        response TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        expires_at REAL NOT NULL,
+        last_used_at REAL NOT NULL,
+        hit_count INTEGER DEFAULT 0 NOT NULL
+    );"""
+
+CREATE_CACHE_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_ai_response_cache_last_used
+    ON ai_response_cache (last_used_at);"""
+
+
+def normalize_query(query):
+    """Lower-cases a query and collapses whitespace and edge punctuation."""
+    query = re.sub(r'\s+', ' ', str(query)).strip().lower()
+    return query.strip(' .,!?;:"\'')
+
+
+def make_cache_key(endpoint, query, model, prompt_version):
+    raw = "\x1f".join([endpoint, model, str(prompt_version), normalize_query(query)])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU in front of a TTL/LRU-bounded SQLite table.
+
+    ``connection()`` must be a context manager yielding an open DB-API
+    connection for the duration of one lookup or store. Database failures
+    are logged and treated as cache misses so a broken cache never breaks
+    generation.
+    """
+
+    def __init__(self, connection, ttl_seconds=7 * 24 * 3600, memory_size=256, max_rows=5000):
+        self._connection = connection
+        self.ttl_seconds = ttl_seconds
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _remember(self, key, value, expires_at):
+        with self._lock:
+            self._memory[key] = (value, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return entry[0]
+                del self._memory[key]
+
+        try:
+            with self._connection() as db:
+                c = db.cursor()
+                c.execute("SELECT response, expires_at FROM ai_response_cache WHERE cache_key = ?", (key,))
+                row = c.fetchone()
+                if row is None or row[1] <= now:
+                    self._count("misses")
+                    return None
+                c.execute("UPDATE ai_response_cache SET last_used_at = ?, hit_count = hit_count + 1 WHERE cache_key = ?", (now, key))
+                db.commit()
+            value = json.loads(row[0])
+        except Exception as e:
+            print(f"Cache Read Error: {str(e)}")
+            self._count("errors")
+            self._count("misses")
+            return None
+
+        self._remember(key, value, row[1])
+        self._count("db_hits")
+        return value
+
+    def set(self, key, endpoint, query, value):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        try:
+            with self._connection() as db:
+                c = db.cursor()
+                c.execute(
+                    "INSERT OR REPLACE INTO ai_response_cache(cache_key, endpoint, query, title, response, created_at, expires_at, last_used_at) VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, endpoint, normalize_query(query), value.get('title') if isinstance(value, dict) else None, json.dumps(value), now, expires_at, now),
+                )
+                c.execute("DELETE FROM ai_response_cache WHERE expires_at <= ?", (now,))
+                c.execute(
+                    "DELETE FROM ai_response_cache WHERE cache_key NOT IN (SELECT cache_key FROM ai_response_cache ORDER BY last_used_at DESC LIMIT ?)",
+                    (self.max_rows,),
+                )
+                if c.rowcount and c.rowcount > 0:
+                    self._count("evictions", c.rowcount)
+                db.commit()
+            self._count("stores")
+        except Exception as e:
+            print(f"Cache Write Error: {str(e)}")
+            self._count("errors")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["memory_hits"] + stats["db_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,178 @@
+"""JSON helpers for model output.
+
+``IncrementalJSONParser`` is fed the model's text as it streams in and
+reports every nested object or array as soon as its closing bracket
+arrives, so callers can forward finished modules and chapters without
+waiting for the whole document.
+
+``parse_json_lenient`` finds the first balanced top-level object in a
+single linear pass, ignoring any chatter around it. If the model stopped
+early, it cuts the text back to the last complete member and closes the
+open arrays and objects, so everything that did arrive can be kept.
+"""
+import json
+
+
+class IncrementalJSONParser:
+    """Single-pass scanner over the first top-level JSON object in a stream.
+
+    ``want(path)`` decides which completed containers are reported; ``path``
+    is a tuple of keys and list indexes such as ``('modules', 0, 'chapters', 2)``.
+    Any text the model writes before the opening brace is skipped.
+    """
+
+    def __init__(self, want):
+        self._want = want
+        self._buffer = []
+        self._size = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._started = False
+        self.done = False
+
+    def feed(self, text):
+        """Consumes a chunk and returns ``[(path, value), ...]`` completed in it."""
+        completed = []
+        for ch in text:
+            if self.done:
+                break
+            if not self._started:
+                if ch != '{':
+                    continue
+                self._started = True
+
+            position = self._size
+            self._buffer.append(ch)
+            self._size += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = (self._string_start, position + 1)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = position
+            elif ch in '{[':
+                self._stack.append({"type": ch, "start": position, "key": None, "index": 0})
+            elif ch in '}]':
+                if not self._stack:
+                    continue
+                frame = self._stack.pop()
+                if not self._stack:
+                    self.done = True
+                path = self._path_of_current()
+                if self._want(path):
+                    raw = ''.join(self._buffer[frame["start"]:position + 1])
+                    try:
+                        completed.append((path, json.loads(raw)))
+                    except json.JSONDecodeError:
+                        pass
+            elif ch == ':' and self._stack and self._stack[-1]["type"] == '{' and self._last_string:
+                start, end = self._last_string
+                self._stack[-1]["key"] = json.loads(''.join(self._buffer[start:end]))
+            elif ch == ',' and self._stack and self._stack[-1]["type"] == '[':
+                self._stack[-1]["index"] += 1
+        return completed
+
+    def _path_of_current(self):
+        """Path of the value that has just been closed, relative to the root."""
+        path = []
+        for frame in self._stack:
+            path.append(frame["key"] if frame["type"] == '{' else frame["index"])
+        return tuple(path)
+
+    def text(self):
+        return ''.join(self._buffer)
+
+
+CLOSERS = {'{': '}', '[': ']'}
+
+
+def _scan(text):
+    """Returns ``(start, end, safe_end, safe_stack)`` for the first top-level object in ``text``.
+
+    ``start`` is the index of its opening brace (None if there is none) and
+    ``end`` the index just past its closing brace, or None if the text is
+    truncated. ``safe_end``/``safe_stack`` describe the last point at
+    which the text could be cut and closed to form valid JSON.
+    """
+    start = text.find('{')
+    if start < 0:
+        return None, None, None, None
+    stack = []
+    in_string = escape = False
+    safe_end, safe_stack = None, None
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append(ch)
+            safe_end, safe_stack = i + 1, ''.join(stack)
+        elif ch in '}]':
+            if not stack:
+                break
+            stack.pop()
+            if not stack:
+                return start, i + 1, None, None
+            safe_end, safe_stack = i + 1, ''.join(stack)
+        elif ch == ',':
+            safe_end, safe_stack = i, ''.join(stack)
+    return start, None, safe_end, safe_stack
+
+
+def extract_json_object(text):
+    """Returns the text of the first balanced top-level object, or None."""
+    start, end, _, _ = _scan(text or '')
+    return text[start:end] if end is not None else None
+
+
+def repair_truncated_json(text):
+    """Cuts a truncated object back to its last complete member and closes it, or returns None."""
+    start, end, safe_end, safe_stack = _scan(text or '')
+    if start is None:
+        return None
+    if end is not None:
+        return text[start:end]
+    if safe_end is None:
+        return None
+    return text[start:safe_end] + ''.join(CLOSERS[opener] for opener in reversed(safe_stack))
+
+
+def parse_json_lenient(text):
+    """Parses the first JSON object in ``text``.
+
+    Returns ``(data, complete)``: ``complete`` is False when the object had
+    to be repaired because the text was truncated, and ``data`` is None if
+    nothing usable could be recovered.
+    """
+    balanced = extract_json_object(text)
+    if balanced is not None:
+        try:
+            return json.loads(balanced), True
+        except json.JSONDecodeError:
+            pass
+    repaired = repair_truncated_json(text)
+    if repaired is not None:
+        try:
+            return json.loads(repaired), False
+        except json.JSONDecodeError:
+            pass
+    return None, False
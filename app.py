@@ -1,82 +1,287 @@
 import os
 import json
-import re
+import sqlite3
+import base64
+import zlib
 from datetime import datetime, timedelta
+from contextlib import contextmanager
 from functools import wraps
-from dotenv import load_dotenv
 import jwt
-import sqlitecloud as sq
-from flask import Flask, request, jsonify, g, render_template
-from flask_bcrypt import Bcrypt
-import requests
-
-load_dotenv()
-
-app = Flask(__name__)
-bcrypt = Bcrypt(app)
-
-app.config['SECRET_KEY'] = os.environ.get('JWT_SECRET')
+from flask import Blueprint, Flask, current_app, request, jsonify, g, render_template, Response, stream_with_context, has_app_context, make_response
+from ai_cache import ResponseCache, make_cache_key, normalize_query
+from ai_json import IncrementalJSONParser, parse_json_lenient
+from auth_cache import TokenCache, RevocationList
+from chat_sessions import ConversationManager
+from course_pipeline import complete_course, generate_course_parallel
+from db_pool import ConnectionPool, PoolTimeoutError
+from jobs import JobQueue, TooManyJobsError
+from lazy import Lazy
+from metrics import registry as metrics, span, start_trace, end_trace, record_usage, format_breakdown
+from migrations import migrate, schema_version
+from prompts import COURSE_PROMPT, CAREER_PATH_PROMPT, CHAT_SYSTEM_PROMPT
+from rate_limit import RateLimiter, RateLimitExceeded, create_store
+from password_hashing import PasswordHasher, HashingOverloadedError, calibrate_rounds, load_rounds, store_rounds
+
+if os.path.exists('.env'):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+api = Blueprint('api', __name__)
+
+JWT_SECRET = os.environ.get('JWT_SECRET')
 OPENROUTER_API_KEY = os.environ.get('OPENROUTER_API_KEY')
 AI_MODEL = 'alibaba/tongyi-deepresearch-30b-a3b:free'
 
+# Bump these whenever the matching prompt changes so stale cached responses are not served.
+COURSE_PROMPT_VERSION = 2
+SINGLE_COURSE_PROMPT_VERSION = 1
+CAREER_PATH_PROMPT_VERSION = 1
+
+# 'parallel' builds courses from an outline plus concurrent per-chapter calls; 'single' uses one large prompt.
+COURSE_GENERATION_MODE = os.environ.get('COURSE_GENERATION_MODE', 'parallel')
+COURSE_PIPELINE_WORKERS = int(os.environ.get('COURSE_PIPELINE_WORKERS', 4))
+COURSE_PIPELINE_RETRIES = int(os.environ.get('COURSE_PIPELINE_RETRIES', 1))
+
 SQLITECLOUD_CONNECTION = os.environ.get("SQLITECLOUD_CONNECTION_STRING")
+# Local SQLite file used instead of SQLite Cloud for development and benchmarks.
+LOCAL_SQLITE_PATH = os.environ.get("LOCAL_SQLITE_PATH")
 
-if not app.config['SECRET_KEY']:
+if not JWT_SECRET:
     raise ValueError("FATAL ERROR: JWT_SECRET environment variable is not set.")
 if not OPENROUTER_API_KEY:
     raise ValueError("FATAL ERROR: OPENROUTER_API_KEY environment variable is not set.")
-if not SQLITECLOUD_CONNECTION:
+if not SQLITECLOUD_CONNECTION and not LOCAL_SQLITE_PATH:
     raise ValueError("FATAL ERROR: SQLITECLOUD_CONNECTION_STRING environment variable is not set.")
 
+def connect_db():
+    if LOCAL_SQLITE_PATH:
+        db = sqlite3.connect(LOCAL_SQLITE_PATH, timeout=10, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.row_factory = sqlite3.Row
+        return db
+    import sqlitecloud
+    db = sqlitecloud.connect(SQLITECLOUD_CONNECTION)
+    db.row_factory = sqlitecloud.Row
+    return db
+
+def integrity_errors():
+    """Exception types raised for constraint violations by whichever database is configured."""
+    if LOCAL_SQLITE_PATH:
+        return (sqlite3.IntegrityError,)
+    import sqlitecloud
+    return (sqlitecloud.IntegrityError, sqlite3.IntegrityError)
+
+db_pool = ConnectionPool(
+    connect_db,
+    size=int(os.environ.get('DB_POOL_SIZE', 5)),
+    max_lifetime=float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+    checkout_timeout=float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    health_check_interval=float(os.environ.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30)),
+)
+
 def get_db():
     if 'db' not in g:
-        g.db = sq.connect(SQLITECLOUD_CONNECTION)
-        g.db.row_factory = sq.Row
+        with span('db_checkout'):
+            g.db = db_pool.acquire()
     return g.db
 
-@app.teardown_appcontext
 def close_db(e=None):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        db_pool.release(db)
+
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 0))
+
+@api.before_app_request
+def begin_request_trace():
+    g.trace = start_trace(request.url_rule.rule if request.url_rule else 'unmatched')
+
+def record_request(trace, method, path, status):
+    elapsed = trace.elapsed()
+    metrics.observe('http_request_duration_seconds', elapsed, method=method, route=trace.name, status=status)
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        print(f"Slow Request: {method} {path} {status} in {elapsed * 1000:.0f}ms - {format_breakdown(trace)}")
+
+@api.after_app_request
+def remember_status(response):
+    g.status_code = response.status_code
+    trace = g.get('trace')
+    if trace is not None and response.is_streamed:
+        # Streamed bodies are produced after the request is torn down; time them until the client is done.
+        g.pop('trace')
+        method, path, status = request.method, request.path, response.status_code
+        def finish():
+            record_request(trace, method, path, status)
+            end_trace()
+        response.call_on_close(finish)
+    return response
+
+@api.teardown_app_request
+def finish_request_trace(e=None):
+    trace = g.pop('trace', None)
+    if trace is None:
+        return
+    end_trace()
+    record_request(trace, request.method, request.path, g.get('status_code', 500))
+
+@contextmanager
+def db_connection():
+    """Borrows a pooled connection for a short block of work.
+
+    Reuses the request's connection when one is already checked out, so code
+    that runs around long AI calls does not pin a connection while it waits.
+    """
+    if has_app_context() and 'db' in g:
+        yield g.db
+        return
+    with span('db_checkout'):
+        db = db_pool.acquire()
+    try:
+        yield db
+    except Exception:
+        try:
+            db.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        db_pool.release(db)
+
+def create_password_hasher():
+    from flask_bcrypt import Bcrypt
+    bcrypt = Bcrypt()
+    if os.environ.get('BCRYPT_LOG_ROUNDS'):
+        rounds = int(os.environ['BCRYPT_LOG_ROUNDS'])
+    else:
+        # Calibrated once per deployment by ``calibrate_bcrypt_command`` so every worker agrees on the cost.
+        try:
+            with db_connection() as db:
+                rounds = load_rounds(db) or 12
+        except Exception as e:
+            print(f"Bcrypt Cost Load Error: {str(e)}")
+            rounds = 12
+    return PasswordHasher(
+        bcrypt,
+        rounds=rounds,
+        max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+        max_queue=int(os.environ.get('PASSWORD_HASH_QUEUE', 16)),
+    )
+
+password_hasher = Lazy(create_password_hasher)
+
+# Courses from the single large prompt (streaming and 'single' mode) are cached apart from outline-plus-chapter courses.
+PROMPT_VERSIONS = {'generate-course': COURSE_PROMPT_VERSION, 'generate-course-single': SINGLE_COURSE_PROMPT_VERSION, 'generate-career-path': CAREER_PATH_PROMPT_VERSION}
+
+def course_cache_endpoint(single):
+    return 'generate-course-single' if single else 'generate-course'
+
+def create_similarity_index():
+    from similarity import SimilarityIndex
+    index = SimilarityIndex(
+        db_connection,
+        key_for=lambda endpoint, query: make_cache_key(endpoint, query, AI_MODEL, PROMPT_VERSIONS.get(endpoint)),
+        threshold=float(os.environ.get('SIMILARITY_THRESHOLD', 0.8)),
+        max_entries=int(os.environ.get('SIMILARITY_MAX_ENTRIES', 4000)),
+    )
+    index.enabled = os.environ.get('SIMILARITY_MATCHING', '1') == '1'
+    return index
+
+similarity_index = Lazy(create_similarity_index)
+
+@api.app_errorhandler(HashingOverloadedError)
+def handle_hashing_overloaded(e):
+    print(f"Password Hashing Overloaded: {str(e)}")
+    return jsonify({"error": "The server is busy. Please try again in a moment."}), 503, {"Retry-After": "1"}
+
+@api.app_errorhandler(PoolTimeoutError)
+def handle_pool_timeout(e):
+    print(f"Database Pool Error: {str(e)}")
+    return jsonify({"error": "The server is busy. Please try again."}), 503
+
+class TimedCursor:
+    """Cursor wrapper that records every query as a ``db_query`` span."""
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, *args):
+        with span('db_query'):
+            return self._cursor.execute(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
 
 def sqldb(function):
     @wraps(function)
     def wrapper(*args, **kwargs):
         db = get_db()
-        c = db.cursor()
+        c = TimedCursor(db.cursor())
         try:
             result = function(c, *args, **kwargs)
-            db.commit()
+            with span('db_commit'):
+                db.commit()
             return result
         except Exception as e:
             db.rollback()
             raise e
     return wrapper
 
-@sqldb
-def init_db(c):
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        full_name TEXT NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-        role TEXT DEFAULT 'user' NOT NULL
-    );""")
-    
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS saved_courses (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        course_title TEXT NOT NULL,
-        course_data TEXT NOT NULL,
-        saved_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-    );""")
-    
-    print("✓ Database initialized successfully.")
+def create_openrouter():
+    from openrouter_client import OpenRouterClient, CircuitBreaker
+    return OpenRouterClient(
+        OPENROUTER_API_KEY,
+        base_url=os.environ.get('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1'),
+        connect_timeout=float(os.environ.get('OPENROUTER_CONNECT_TIMEOUT', 5)),
+        read_timeout=float(os.environ.get('OPENROUTER_READ_TIMEOUT', 120)),
+        pool_size=int(os.environ.get('OPENROUTER_POOL_SIZE', 10)),
+        max_retries=int(os.environ.get('OPENROUTER_MAX_RETRIES', 3)),
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.environ.get('OPENROUTER_BREAKER_THRESHOLD', 5)),
+            reset_timeout=float(os.environ.get('OPENROUTER_BREAKER_RESET_SECONDS', 30)),
+        ),
+    )
+
+openrouter = Lazy(create_openrouter)
+
+response_cache = ResponseCache(
+    db_connection,
+    ttl_seconds=int(os.environ.get('AI_CACHE_TTL_SECONDS', 7 * 24 * 3600)),
+    memory_size=int(os.environ.get('AI_CACHE_MEMORY_SIZE', 256)),
+    max_rows=int(os.environ.get('AI_CACHE_MAX_ROWS', 5000)),
+)
+
+def compress_course(course_data):
+    return zlib.compress(json.dumps(course_data, separators=(',', ':')).encode('utf-8'))
+
+def load_course_data(course_blob, course_data):
+    """Returns the course JSON text from a compressed blob, falling back to the legacy TEXT column."""
+    if course_blob:
+        return zlib.decompress(course_blob).decode('utf-8')
+    return course_data
+
+def encode_cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Returns the ``[timestamp, id]`` pair packed by ``encode_cursor``, or None if the cursor is malformed."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(values, list) or len(values) != 2:
+        return None
+    timestamp, row_id = values
+    if isinstance(timestamp, bool) or not isinstance(timestamp, (str, int)) or isinstance(row_id, bool) or not isinstance(row_id, int):
+        return None
+    return values
+
+def parse_limit(default=20, maximum=100):
+    try:
+        return max(1, min(int(request.args.get('limit', default)), maximum))
+    except ValueError:
+        return default
+
+token_cache = TokenCache(max_size=int(os.environ.get('TOKEN_CACHE_SIZE', 10000)))
+revocations = RevocationList(db_connection, refresh_interval=float(os.environ.get('REVOCATION_REFRESH_SECONDS', 30)))
 
 def authenticate_token(f):
     @wraps(f)
@@ -90,17 +295,69 @@ def authenticate_token(f):
         if not token:
             return jsonify({"error": "Authentication token is required."}), 401
 
-        try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            g.user = data
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired. Please log in again."}), 403
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Token is invalid."}), 403
+        data = token_cache.get(token)
+        if data is None:
+            try:
+                data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+            except jwt.ExpiredSignatureError:
+                return jsonify({"error": "Token has expired. Please log in again."}), 403
+            except jwt.InvalidTokenError:
+                return jsonify({"error": "Token is invalid."}), 403
+            token_cache.put(token, data)
+
+        if revocations.is_revoked(data):
+            return jsonify({"error": "Token has been revoked. Please log in again."}), 403
+        g.user = data
 
         return f(*args, **kwargs)
     return decorated_function
 
+RATE_LIMITS = {
+    'generation': {
+        "user": (int(os.environ.get('RATE_LIMIT_GENERATION_BURST', 5)), float(os.environ.get('RATE_LIMIT_GENERATION_PER_HOUR', 30)) / 3600),
+        "ip": (int(os.environ.get('RATE_LIMIT_GENERATION_IP_BURST', 20)), float(os.environ.get('RATE_LIMIT_GENERATION_IP_PER_HOUR', 120)) / 3600),
+        "concurrent": int(os.environ.get('RATE_LIMIT_GENERATION_CONCURRENT', 2)),
+    },
+    'chat': {
+        "user": (int(os.environ.get('RATE_LIMIT_CHAT_BURST', 20)), float(os.environ.get('RATE_LIMIT_CHAT_PER_MINUTE', 10)) / 60),
+        "ip": (int(os.environ.get('RATE_LIMIT_CHAT_IP_BURST', 60)), float(os.environ.get('RATE_LIMIT_CHAT_IP_PER_MINUTE', 30)) / 60),
+        "concurrent": int(os.environ.get('RATE_LIMIT_CHAT_CONCURRENT', 3)),
+    },
+}
+
+rate_limiter = RateLimiter(create_store(os.environ.get('RATE_LIMIT_STORE', 'memory'), os.environ.get('RATE_LIMIT_DB_PATH')), RATE_LIMITS)
+
+def client_ip():
+    # The platform router appends the real client address last; earlier X-Forwarded-For entries are client-controlled.
+    return request.access_route[-1] if request.access_route else request.remote_addr
+
+def rate_limited(scope):
+    """Applies the RATE_LIMITS rule for ``scope``; must be placed under ``authenticate_token``.
+
+    Responses served from the response cache get their tokens back, so only
+    upstream model work is charged.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            release = rate_limiter.check(scope, g.user['userId'], client_ip())
+            try:
+                response = make_response(f(*args, **kwargs))
+            except Exception as e:
+                release(refund=isinstance(e, RateLimitExceeded))
+                raise
+            if g.pop('served_from_cache', False):
+                release(refund=True)
+            else:
+                response.call_on_close(release)
+            return response
+        return decorated_function
+    return decorator
+
+@api.app_errorhandler(RateLimitExceeded)
+def handle_rate_limited(e):
+    return jsonify({"error": str(e)}), 429, {"Retry-After": str(e.retry_after)}
+
 def authenticate_admin(f):
     @wraps(f)
     @authenticate_token
@@ -110,7 +367,12 @@ def authenticate_admin(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def generate_ai_content(messages, is_json_response=False):
+def generate_ai_content(messages, is_json_response=False, allow_partial=False):
+    """Returns ``(data, error)``.
+
+    With ``allow_partial`` a JSON reply that was cut off is repaired instead of
+    rejected, and ``data`` is a ``(value, complete)`` pair.
+    """
     try:
         payload = {
             "model": AI_MODEL,
@@ -119,39 +381,143 @@ def generate_ai_content(messages, is_json_response=False):
         if is_json_response:
             payload["response_format"] = {"type": "json_object"}
 
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={"Authorization": f"Bearer {OPENROUTER_API_KEY}"},
-            json=payload
-        )
-        response.raise_for_status()
-        
-        response_data = response.json()
+        with span('generate_ai_content'):
+            response = openrouter.post_chat(payload)
+            response.raise_for_status()
+            response_data = response.json()
+        record_usage(response_data.get('usage'))
         response_text = response_data['choices'][0]['message']['content']
+        if not response_text:
+            # Providers sometimes answer with "content": null; never hand that on to be stored.
+            print("AI Response Empty: the model returned no content.")
+            return None, ({"error": "The AI returned an empty response. Please try again."}, 500)
         
         if is_json_response:
-            match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if not match:
+            data, complete = parse_json_lenient(response_text)
+            if data is None or (not complete and not allow_partial):
                 raise json.JSONDecodeError("No valid JSON object found in the AI response.", response_text, 0)
-            return json.loads(match.group(0)), None
+            if not complete:
+                print(f"AI Response Truncated: repaired {len(response_text)} characters of JSON.")
+            return ((data, complete) if allow_partial else data), None
         
         return response_text, None
 
-    except requests.exceptions.HTTPError as e:
-        print(f"HTTP Error: {e.response.text}")
-        return None, ({"error": f"API request failed: {e.response.reason}"}, e.response.status_code)
     except json.JSONDecodeError as e:
         print(f"JSON Decode Error: {e.msg} - Response: {e.doc}")
         return None, ({"error": "The AI returned an invalid format. Please try again."}, 500)
     except Exception as e:
-        print(f"An unexpected AI error occurred: {str(e)}")
-        return None, ({"error": f"An AI communication error occurred."}, 500)
+        return None, ai_error(e)
 
-@app.route('/health')
+def ai_error(e):
+    """Maps an exception from an upstream model call to ``(body, status)``."""
+    import requests
+    from openrouter_client import CircuitOpenError
+    if isinstance(e, requests.exceptions.HTTPError):
+        print(f"HTTP Error: {e.response.text}")
+        return {"error": f"API request failed: {e.response.reason}"}, e.response.status_code
+    if isinstance(e, CircuitOpenError):
+        print(f"AI Circuit Open: {str(e)}")
+        return {"error": "The AI service is temporarily unavailable. Please try again shortly."}, 503
+    if isinstance(e, requests.exceptions.Timeout):
+        print("AI Timeout: OpenRouter did not respond in time.")
+        return {"error": "The AI service timed out. Please try again."}, 504
+    print(f"An unexpected AI error occurred: {str(e)}")
+    return {"error": "An AI communication error occurred."}, 500
+
+def cached_generation(endpoint, user_query, cache_key):
+    """Returns a stored response for the exact query or, failing that, for a close enough earlier query."""
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        match = similarity_index.lookup(endpoint, user_query)
+        if match:
+            cached = response_cache.get(match['cacheKey'])
+            if cached is not None:
+                print(f"Similarity Match: '{user_query}' -> '{match['text']}' ({match['score']})")
+    if cached is not None and has_app_context():
+        g.served_from_cache = True
+    return cached
+
+def store_generation(endpoint, user_query, cache_key, data):
+    response_cache.set(cache_key, endpoint, user_query, data)
+    similarity_index.add(endpoint, normalize_query(user_query), data.get('title') if isinstance(data, dict) else None, cache_key)
+
+def stream_ai_content(messages, is_json_response=False):
+    """Yields content deltas from OpenRouter as they arrive (server-sent events upstream)."""
+    payload = {
+        "model": AI_MODEL,
+        "messages": messages,
+        "stream": True,
+        "stream_options": {"include_usage": True}
+    }
+    if is_json_response:
+        payload["response_format"] = {"type": "json_object"}
+
+    with span('stream_ai_content'), openrouter.post_chat(payload, stream=True) as response:
+        response.raise_for_status()
+        response.encoding = 'utf-8'
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            chunk = line[len('data:'):].strip()
+            if chunk == '[DONE]':
+                break
+            event = json.loads(chunk)
+            record_usage(event.get('usage'))
+            choices = event.get('choices') or [{}]
+            delta = choices[0].get('delta', {}).get('content')
+            if delta:
+                yield delta
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def wants_stream():
+    return request.args.get('stream') in ('1', 'true') or 'text/event-stream' in request.headers.get('Accept', '')
+
+def sse_response(events):
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def stream_error_event(e):
+    body, status = ai_error(e)
+    return sse_event("error", dict(body, status=status))
+
+def is_course_fragment(path):
+    return (len(path) == 2 and path[0] == 'modules') or (len(path) == 4 and path[0] == 'modules' and path[2] == 'chapters')
+
+def lazy_stats(client):
+    """Stats of a ``Lazy`` client, without creating it just to report on it."""
+    return client.stats() if client.created else {"initialized": False}
+
+def component_stats():
+    return {"cache": response_cache.stats(), "openrouter": lazy_stats(openrouter), "jobs": job_queue.stats(), "db_pool": db_pool.stats(), "password_hashing": lazy_stats(password_hasher), "token_cache": token_cache.stats(), "rate_limiter": rate_limiter.stats(), "similarity": lazy_stats(similarity_index)}
+
+def component_gauges():
+    """Numeric values from ``component_stats()`` as ``component_stat`` gauges for ``/metrics``."""
+    gauges = []
+    for component, stats in component_stats().items():
+        for name, value in stats.items():
+            values = value.items() if isinstance(value, dict) else [(None, value)]
+            for sub, number in values:
+                if isinstance(number, (int, float)):
+                    stat = f"{name}_{sub}" if sub else name
+                    gauges.append(('component_stat', {"component": component, "stat": stat}, float(number)))
+    return gauges
+
+metrics.describe('component_stat', 'gauge', 'Numeric values from the /health component stats.')
+metrics.add_collector(component_gauges)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+@api.route('/health')
 def health_check():
-    return jsonify({"status": "healthy", "timestamp": datetime.utcnow().isoformat()}), 200
+    return jsonify({"status": "healthy", "timestamp": datetime.utcnow().isoformat(), **component_stats()}), 200
 
-@app.route('/api/signup', methods=['POST'])
+@api.route('/metrics')
+def metrics_endpoint():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return jsonify({"error": "Unauthorized."}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/api/signup', methods=['POST'])
 @sqldb
 def signup(c):
     data = request.get_json()
@@ -172,16 +538,19 @@ def signup(c):
         return jsonify({"error": "Password must be at least 6 characters."}), 400
 
     try:
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        with span('password_hash', op='hash'):
+            hashed_password = password_hasher.hash(password)
         c.execute("INSERT INTO users(full_name, email, password) VALUES(?, ?, ?)", (full_name, email, hashed_password))
         return jsonify({"message": "Account created successfully!"}), 201
-    except sq.IntegrityError:
+    except integrity_errors():
         return jsonify({"error": "A user with this email already exists."}), 409
+    except HashingOverloadedError:
+        raise
     except Exception as e:
         print(f"Signup Error: {str(e)}")
         return jsonify({"error": "An error occurred during registration."}), 500
 
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
 @sqldb
 def login(c):
     data = request.get_json()
@@ -196,17 +565,29 @@ def login(c):
     try:
         c.execute("SELECT * FROM users WHERE email = ?", (email,))
         user = c.fetchone()
-        if user and bcrypt.check_password_hash(user['password'], password):
-            payload = {'userId': user['id'], 'email': user['email'], 'role': user['role'], 'exp': datetime.utcnow() + timedelta(days=7)}
-            token = jwt.encode(payload, app.config['SECRET_KEY'], algorithm="HS256")
+        with span('password_hash', op='check'):
+            password_ok = user is not None and password_hasher.check(user['password'], password)
+        if password_ok:
+            if password_hasher.needs_rehash(user['password']):
+                try:
+                    with span('password_hash', op='rehash'):
+                        rehashed = password_hasher.hash(password)
+                    c.execute("UPDATE users SET password = ? WHERE id = ?", (rehashed, user['id']))
+                    password_hasher.record_rehash()
+                except HashingOverloadedError:
+                    pass
+            payload = {'userId': user['id'], 'email': user['email'], 'role': user['role'], 'iat': datetime.utcnow(), 'exp': datetime.utcnow() + timedelta(days=7)}
+            token = jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm="HS256")
             return jsonify({"message": "Login successful!", "token": token, "userId": user['id'], "role": user['role']}), 200
         else:
             return jsonify({"error": "Invalid email or password."}), 401
+    except HashingOverloadedError:
+        raise
     except Exception as e:
         print(f"Login Error: {str(e)}")
         return jsonify({"error": "An error occurred during login."}), 500
 
-@app.route('/api/profile', methods=['GET', 'PUT'])
+@api.route('/api/profile', methods=['GET', 'PUT'])
 @authenticate_token
 @sqldb
 def profile(c):
@@ -228,20 +609,22 @@ def profile(c):
             c.execute("SELECT id, full_name, email FROM users WHERE id = ?", (user_id,))
             updated_user = c.fetchone()
             return jsonify({"message": "Profile updated successfully!", "user": dict(updated_user)}), 200
-        except sq.IntegrityError:
+        except integrity_errors():
             return jsonify({"error": "This email is already taken by another user."}), 409
         except Exception as e:
             print(f"Profile PUT Error: {str(e)}")
             return jsonify({"error": "Could not update profile."}), 500
 
-@app.route('/api/saved-courses', methods=['GET', 'POST'])
+@api.route('/api/saved-courses', methods=['GET', 'POST'])
 @authenticate_token
 @sqldb
 def saved_courses(c):
     user_id = g.user['userId']
     if request.method == 'GET':
-        c.execute("SELECT id, course_title, course_data, saved_at FROM saved_courses WHERE user_id = ? ORDER BY saved_at DESC", (user_id,))
-        courses = [dict(course) for course in c.fetchall()]
+        if request.args.get('view') == 'summary':
+            return saved_course_summaries(c, user_id)
+        c.execute("SELECT id, course_title, course_data, course_blob, saved_at FROM saved_courses WHERE user_id = ? ORDER BY saved_at DESC", (user_id,))
+        courses = [{"id": course['id'], "course_title": course['course_title'], "course_data": load_course_data(course['course_blob'], course['course_data']), "saved_at": course['saved_at']} for course in c.fetchall()]
         return jsonify(courses), 200
     
     if request.method == 'POST':
@@ -251,13 +634,53 @@ def saved_courses(c):
         if not course_data or 'title' not in course_data: return jsonify({"error": "Valid course data is required."}), 400
         
         try:
-            c.execute("INSERT INTO saved_courses(user_id, course_title, course_data) VALUES(?, ?, ?)",(user_id, course_data['title'], json.dumps(course_data)))
+            c.execute("INSERT INTO saved_courses(user_id, course_title, course_description, difficulty, course_data, course_blob) VALUES(?, ?, ?, ?, '', ?)",
+                      (user_id, course_data['title'], course_data.get('description'), course_data.get('difficulty'), compress_course(course_data)))
             return jsonify({"message": "Course saved successfully!"}), 201
         except Exception as e:
             print(f"Saved Courses POST Error: {str(e)}")
             return jsonify({"error": "Could not save course."}), 500
 
-@app.route('/api/saved-courses/<int:course_id>', methods=['DELETE'])
+def saved_course_summaries(c, user_id):
+    limit = parse_limit()
+    cursor = request.args.get('cursor')
+    if cursor:
+        position = decode_cursor(cursor)
+        if not position: return jsonify({"error": "Invalid cursor."}), 400
+        c.execute("""SELECT id, course_title, course_description, difficulty, saved_at FROM saved_courses
+                     WHERE user_id = ? AND (saved_at, id) < (?, ?)
+                     ORDER BY saved_at DESC, id DESC LIMIT ?""", (user_id, position[0], position[1], limit + 1))
+    else:
+        c.execute("""SELECT id, course_title, course_description, difficulty, saved_at FROM saved_courses
+                     WHERE user_id = ? ORDER BY saved_at DESC, id DESC LIMIT ?""", (user_id, limit + 1))
+    rows = c.fetchall()
+    courses = [{"id": row['id'], "title": row['course_title'], "description": row['course_description'], "difficulty": row['difficulty'], "saved_at": row['saved_at']} for row in rows[:limit]]
+    next_cursor = encode_cursor(courses[-1]['saved_at'], courses[-1]['id']) if len(rows) > limit else None
+    return jsonify({"courses": courses, "nextCursor": next_cursor}), 200
+
+def fetch_saved_course(c, course_id, user_id):
+    c.execute("SELECT id, course_title, course_data, course_blob, saved_at FROM saved_courses WHERE id = ? AND user_id = ?", (course_id, user_id))
+    return c.fetchone()
+
+@api.route('/api/saved-courses/<int:course_id>', methods=['GET'])
+@authenticate_token
+@sqldb
+def get_saved_course(c, course_id):
+    course = fetch_saved_course(c, course_id, g.user['userId'])
+    if not course: return jsonify({"error": "Course not found or unauthorized."}), 404
+    return jsonify({"id": course['id'], "course_title": course['course_title'], "course_data": load_course_data(course['course_blob'], course['course_data']), "saved_at": course['saved_at']}), 200
+
+@api.route('/api/saved-courses/<int:course_id>/modules/<int:module_index>', methods=['GET'])
+@authenticate_token
+@sqldb
+def get_saved_course_module(c, course_id, module_index):
+    course = fetch_saved_course(c, course_id, g.user['userId'])
+    if not course: return jsonify({"error": "Course not found or unauthorized."}), 404
+    modules = json.loads(load_course_data(course['course_blob'], course['course_data'])).get('modules', [])
+    if module_index >= len(modules): return jsonify({"error": "Module not found."}), 404
+    return jsonify({"courseId": course['id'], "moduleIndex": module_index, "moduleCount": len(modules), "module": modules[module_index]}), 200
+
+@api.route('/api/saved-courses/<int:course_id>', methods=['DELETE'])
 @authenticate_token
 @sqldb
 def delete_saved_course(c, course_id):
@@ -268,168 +691,258 @@ def delete_saved_course(c, course_id):
     c.execute("DELETE FROM saved_courses WHERE id = ?", (course_id,))
     return jsonify({"message": "Course deleted successfully."}), 200
 
-@app.route('/api/generate-course-with-ai', methods=['POST'])
+def build_single_course_messages(user_query):
+    prompt = COURSE_PROMPT.render(user_query=user_query)
+    return [{"role": "system", "content": "You are a course creation expert that only outputs JSON."}, {"role": "user", "content": prompt}]
+
+def generate_course_content(user_query, on_progress=None):
+    """Returns ``(course, error)`` for a query, serving repeat and near-duplicate queries from the response cache."""
+    endpoint = course_cache_endpoint(COURSE_GENERATION_MODE != 'parallel')
+    cache_key = make_cache_key(endpoint, user_query, AI_MODEL, PROMPT_VERSIONS[endpoint])
+    cached = cached_generation(endpoint, user_query, cache_key)
+    if cached is not None: return cached, None
+
+    if COURSE_GENERATION_MODE == 'parallel':
+        course_data, error = generate_course_parallel(user_query, generate_ai_content, max_workers=COURSE_PIPELINE_WORKERS, max_retries=COURSE_PIPELINE_RETRIES, on_progress=on_progress)
+    else:
+        result, error = generate_ai_content(messages=build_single_course_messages(user_query), is_json_response=True, allow_partial=True)
+        course_data = None
+        if not error:
+            course_data, complete = result
+            course_data, error, complete = complete_course(user_query, course_data, generate_ai_content, truncated=not complete, max_workers=COURSE_PIPELINE_WORKERS, max_retries=COURSE_PIPELINE_RETRIES, on_progress=on_progress)
+            if not complete: return course_data, error
+    if not error: store_generation(endpoint, user_query, cache_key, course_data)
+    return course_data, error
+
+def stream_course(user_query):
+    # Streaming forwards one single-prompt reply, so its courses live under the single-prompt cache key.
+    endpoint = course_cache_endpoint(single=True)
+    cache_key = make_cache_key(endpoint, user_query, AI_MODEL, PROMPT_VERSIONS[endpoint])
+    cached = cached_generation(endpoint, user_query, cache_key)
+    if cached is not None: return sse_response(iter([sse_event("course", cached)]))
+
+    messages = build_single_course_messages(user_query)
+    def events():
+        parser = IncrementalJSONParser(is_course_fragment)
+        try:
+            for delta in stream_ai_content(messages, is_json_response=True):
+                yield sse_event("delta", {"content": delta})
+                for path, value in parser.feed(delta):
+                    if len(path) == 2:
+                        yield sse_event("module", {"module": path[1], "data": value})
+                    elif path:
+                        yield sse_event("chapter", {"module": path[1], "chapter": path[3], "data": value})
+            partial, complete = parse_json_lenient(parser.text())
+            if not complete:
+                yield sse_event("repairing", {})
+            course, error, complete = complete_course(user_query, partial, generate_ai_content, truncated=not complete, max_workers=COURSE_PIPELINE_WORKERS, max_retries=COURSE_PIPELINE_RETRIES)
+            if error:
+                yield sse_event("error", dict(error[0], status=error[1]))
+                return
+            # A course cut short by a truncated reply is served once but never cached.
+            if complete: store_generation(endpoint, user_query, cache_key, course)
+            yield sse_event("course", course)
+        except Exception as e:
+            yield stream_error_event(e)
+    return sse_response(events())
+
+@api.route('/api/generate-course-with-ai', methods=['POST'])
 @authenticate_token
+@rate_limited('generation')
 def generate_course():
     data = request.get_json()
     if not data or not data.get('query'): return jsonify({"error": "A query is required."}), 400
     user_query = data.get('query')
 
-    prompt = f"""
-        You are an expert course creator who ONLY responds in valid JSON.
-        A user wants a detailed course about: "{user_query}".
-        Create a comprehensive course outline with the following JSON structure. Each module must contain 8 chapters, and each chapter must contain at least 4 pages. The 'content' for each page should be a detailed, educational paragraph.
-
-        {{
-        "title": "Course Title", "description": "Engaging 2-3 sentence description.",
-        "duration": "e.g., '8 Weeks'", "difficulty": "Beginner, Intermediate, or Advanced",
-        "startingSalary": "Realistic starting salary in INR (e.g., '₹4L - ₹6L / yr')",
-        "skills": ["5-7 relevant skills"],
-        "modules": [
-            {{
-            "title": "Module 1: [Module Title]", "description": "Brief overview of the module.",
-            "chapters": [
-                {{
-                "title": "Chapter 1.1: [Chapter Title]",
-                "pages": [
-                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
-                ]
-                }},
-                {{
-                "title": "Chapter 1.2: [Chapter Title]",
-                "pages": [
-                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
-                ]
-                }},
-                {{
-                "title": "Chapter 1.3: [Chapter Title]",
-                "pages": [
-                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
-                ]
-                }},
-                {{
-                "title": "Chapter 1.4: [Chapter Title]",
-                "pages": [
-                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
-                ]
-                }},
-                {{
-                "title": "Chapter 1.5: [Chapter Title]",
-                "pages": [
-                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
-                ]
-                }},
-                {{
-                "title": "Chapter 1.6: [Chapter Title]",
-                "pages": [
-                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
-                ]
-                }},
-                {{
-                "title": "Chapter 1.7: [Chapter Title]",
-                "pages": [
-                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
-                ]
-                }},
-                {{
-                "title": "Chapter 1.8: [Chapter Title]",
-                "pages": [
-                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
-                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
-                ]
-                }}
-              ]
-            }}
-          ]
-        }}
-    """
-    messages = [{"role": "system", "content": "You are a course creation expert that only outputs JSON."}, {"role": "user", "content": prompt}]
-    course_data, error = generate_ai_content(messages=messages, is_json_response=True)
+    if wants_stream(): return stream_course(user_query)
+
+    course_data, error = generate_course_content(user_query)
     return jsonify(error[0] if error else course_data), error[1] if error else 200
 
-@app.route('/api/generate-career-path', methods=['POST'])
+job_queue = JobQueue(None, db_connection, {'course': generate_course_content}, max_workers=int(os.environ.get('JOB_WORKERS', 4)),
+                     retention=float(os.environ.get('JOB_RETENTION_SECONDS', 24 * 3600)))
+
+@api.before_app_request
+def start_job_recovery():
+    # Started by the first request rather than at import, so one-off processes such as the migrate command never pick up jobs.
+    job_queue.start()
+
+@api.route('/api/jobs/generate-course', methods=['POST'])
+@authenticate_token
+@rate_limited('generation')
+def enqueue_course_generation():
+    data = request.get_json()
+    if not data or not data.get('query'): return jsonify({"error": "A query is required."}), 400
+    user_query = data.get('query')
+
+    try:
+        dedupe_key = make_cache_key('generate-course', user_query, AI_MODEL, COURSE_PROMPT_VERSION)
+        # Jobs outlive the request and its concurrency slot, so cap how many a user can have pending instead.
+        job_id = job_queue.submit(g.user['userId'], 'course', user_query, dedupe_key, max_pending=RATE_LIMITS['generation'].get('concurrent'))
+        return jsonify({"jobId": job_id, "status": "queued"}), 202
+    except TooManyJobsError:
+        raise RateLimitExceeded("You already have the maximum number of courses generating.", 30)
+    except Exception as e:
+        print(f"Job Enqueue Error: {str(e)}")
+        return jsonify({"error": "Could not start course generation."}), 500
+
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+@authenticate_token
+def get_job(job_id):
+    job = job_queue.get(job_id, g.user['userId'])
+    if not job: return jsonify({"error": "Job not found."}), 404
+    if job['status'] == 'failed':
+        error = job.pop('error')
+        job['error'] = error['body'].get('error')
+        job['errorStatus'] = error['status']
+    return jsonify(job), 200
+
+@api.route('/api/generate-career-path', methods=['POST'])
 @authenticate_token
+@rate_limited('generation')
 def generate_career_path():
     data = request.get_json()
     if not data or not data.get('query'): return jsonify({"error": "A query is required."}), 400
     user_query = data.get('query')
 
-    prompt = f"""
-        You are a career path expert for the Indian job market who ONLY responds in valid JSON.
-        Generate a career progression for "{user_query}".
-        The JSON must follow this structure:
-        {{
-        "title": "Career Path for {user_query}", "description": "Brief 2-3 sentence description.",
-        "flowchart": {{"roles": [ {{"id": 1, "title": "Job Title", "salary": "₹XL - ₹YL / yr", "stage": "Entry Level, Mid Career, or Late Career"}} ] }}
-        }}
-        Include 8-12 total roles distributed across the three stages.
-    """
+    cache_key = make_cache_key('generate-career-path', user_query, AI_MODEL, CAREER_PATH_PROMPT_VERSION)
+    cached = cached_generation('generate-career-path', user_query, cache_key)
+    if cached is not None: return jsonify(cached), 200
+
+    prompt = CAREER_PATH_PROMPT.render(user_query=user_query)
     messages = [{"role": "system", "content": "You are a career path expert that only outputs JSON."}, {"role": "user", "content": prompt}]
     path_data, error = generate_ai_content(messages=messages, is_json_response=True)
+    if not error: store_generation('generate-career-path', user_query, cache_key, path_data)
     return jsonify(error[0] if error else path_data), error[1] if error else 200
 
-@app.route('/api/chatbot', methods=['POST'])
+conversations = ConversationManager(
+    db_connection,
+    summarize=lambda messages: generate_ai_content(messages=messages, is_json_response=False),
+    token_budget=int(os.environ.get('CHAT_TOKEN_BUDGET', 2000)),
+)
+
+@api.route('/api/chatbot', methods=['POST'])
 @authenticate_token
+@rate_limited('chat')
 def chatbot():
     data = request.get_json()
     if not data or 'query' not in data: return jsonify({"error": "Query is required."}), 400
     
     user_query = data.get('query')
-    history = data.get('history', [])
+    session_id = data.get('sessionId')
     
-    system_prompt = """
-        You are Course2Career Assistant. Your #1 rule is to NEVER mention or suggest external websites like Coursera or Udemy. Your entire focus is on the tools available on THIS website.
-
-        **Your Task:**
-        1. Give a direct, concise answer to the user's question.
-        2. If the question is about learning a skill or a career, add this EXACT sentence to the end of your response: "For a detailed plan, use the **Course Search** and **Career Path Visualizer** tools on our site."
-        3. Use simple HTML for formatting: `<p>`, `<strong>`, `<ul>`, `<li>`. Do NOT include `<html>` or `<body>` tags.
-
-        Remember: Do not mention any other websites.
-    """
+    system_prompt = CHAT_SYSTEM_PROMPT
     
-    messages = [{"role": "system", "content": system_prompt}]
-    messages.extend(history)
-    messages.append({"role": "user", "content": user_query})
+    if 'history' in data and not session_id:
+        # Older clients still send the whole transcript; trim it to the budget and keep nothing server-side.
+        messages = conversations.window(system_prompt, data.get('history') or [], user_query)
+    else:
+        session_id = conversations.ensure_session(g.user['userId'], session_id)
+        if not session_id: return jsonify({"error": "Chat session not found."}), 404
+        messages = conversations.build_messages(session_id, system_prompt, user_query)
+
+    if wants_stream():
+        def events():
+            parts = []
+            try:
+                for delta in stream_ai_content(messages):
+                    parts.append(delta)
+                    yield sse_event("delta", {"content": delta})
+                response_text = ''.join(parts)
+                if session_id: conversations.record_turn(session_id, user_query, response_text)
+                yield sse_event("done", {"response": response_text, "sessionId": session_id})
+            except Exception as e:
+                yield stream_error_event(e)
+        return sse_response(events())
 
     response_text, error = generate_ai_content(messages=messages, is_json_response=False)
     
     if error:
         return jsonify(error[0]), error[1]
-    return jsonify({"response": response_text}), 200
-
-@app.route('/api/users', methods=['GET'])
+    if session_id: conversations.record_turn(session_id, user_query, response_text)
+    return jsonify({"response": response_text, "sessionId": session_id}), 200
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def user_filters():
+    """Builds the WHERE clauses for the admin user filters in the query string."""
+    clauses, params = [], []
+    email, name, role = request.args.get('email'), request.args.get('name'), request.args.get('role')
+    if email:
+        clauses.append("email LIKE ? ESCAPE '\\'")
+        params.append(escape_like(email) + '%')
+    if name:
+        clauses.append("full_name LIKE ? ESCAPE '\\'")
+        params.append(escape_like(name) + '%')
+    if role:
+        clauses.append("role = ?")
+        params.append(role)
+    return clauses, params
+
+@api.route('/api/users', methods=['GET'])
 @authenticate_admin
 @sqldb
 def get_all_users(c):
-    c.execute("SELECT id, full_name, email, role, created_at FROM users ORDER BY created_at DESC")
-    users = c.fetchall()
-    return jsonify([dict(user) for user in users]), 200
+    clauses, params = user_filters()
+    cursor = request.args.get('cursor')
+    if cursor:
+        position = decode_cursor(cursor)
+        if not position: return jsonify({"error": "Invalid cursor."}), 400
+        # A row-value comparison lets SQLite seek idx_users_created; the equivalent OR form scans it.
+        clauses.append("(created_at, id) < (?, ?)")
+        params.extend(position)
+    limit = parse_limit(default=100, maximum=500)
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    c.execute(f"SELECT id, full_name, email, role, created_at FROM users {where} ORDER BY created_at DESC, id DESC LIMIT ?", (*params, limit + 1))
+    users = [dict(user) for user in c.fetchall()]
+
+    response = jsonify(users[:limit])
+    if len(users) > limit:
+        response.headers['X-Next-Cursor'] = encode_cursor(users[limit - 1]['created_at'], users[limit - 1]['id'])
+    return response, 200
+
+@api.route('/api/users/count', methods=['GET'])
+@authenticate_admin
+@sqldb
+def count_users(c):
+    clauses, params = user_filters()
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    c.execute(f"SELECT COUNT(*) FROM users {where}", tuple(params))
+    return jsonify({"count": c.fetchone()[0]}), 200
 
-@app.route('/api/users/<int:user_id>', methods=['DELETE'])
+@api.route('/api/admin/similarity', methods=['GET', 'PUT'])
+@authenticate_admin
+def similarity_settings():
+    if request.method == 'PUT':
+        data = request.get_json()
+        if not data: return jsonify({"error": "No data provided."}), 400
+        threshold = None
+        if 'threshold' in data:
+            try:
+                threshold = float(data['threshold'])
+            except (TypeError, ValueError):
+                return jsonify({"error": "Threshold must be a number."}), 400
+            if not 0 < threshold <= 1: return jsonify({"error": "Threshold must be between 0 and 1."}), 400
+        # Stored in app_settings so every worker picks the change up on its next refresh.
+        similarity_index.save_settings(threshold=threshold, enabled=bool(data['enabled']) if 'enabled' in data else None)
+        if data.get('refresh'):
+            similarity_index.refresh(force=True)
+        return jsonify(similarity_index.stats()), 200
+
+    similarity_index.load_settings()
+    query = request.args.get('q')
+    result = {"settings": similarity_index.stats()}
+    if query:
+        endpoint = request.args.get('endpoint', 'generate-course')
+        matches = similarity_index.search(endpoint, query, limit=parse_limit(default=5, maximum=50))
+        for match in matches:
+            match['wouldServe'] = match['score'] >= similarity_index.threshold
+        result.update({"query": query, "endpoint": endpoint, "matches": matches})
+    return jsonify(result), 200
+
+@api.route('/api/users/<int:user_id>', methods=['DELETE'])
 @authenticate_admin
 @sqldb
 def delete_user(c, user_id):
@@ -437,16 +950,47 @@ def delete_user(c, user_id):
     
     c.execute("DELETE FROM users WHERE id = ?", (user_id,))
     if c.rowcount == 0: return jsonify({"error": "User not found."}), 404
+    revocations.revoke(c, user_id)
     
     return jsonify({"message": "User and all their data deleted successfully."}), 200
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
+@api.route('/', defaults={'path': ''})
+@api.route('/<path:path>')
 def catch_all(path):
     return render_template("index.html")
 
+def migrate_command():
+    """Applies pending schema migrations. Run once per deployment: ``flask --app app migrate``."""
+    with db_connection() as db:
+        ran = migrate(db)
+        version = schema_version(db)
+    print(f"✓ Database schema is at version {version} ({len(ran)} migration(s) applied).")
+
+def calibrate_bcrypt_command():
+    """Times bcrypt against ``BCRYPT_TARGET_MS`` and stores the cost for every worker: ``flask --app app calibrate-bcrypt``."""
+    if os.environ.get('BCRYPT_LOG_ROUNDS') or not os.environ.get('BCRYPT_TARGET_MS'):
+        print("Bcrypt calibration skipped: set BCRYPT_TARGET_MS without BCRYPT_LOG_ROUNDS to enable it.")
+        return
+    from flask_bcrypt import Bcrypt
+    rounds = calibrate_rounds(Bcrypt(), float(os.environ['BCRYPT_TARGET_MS']))
+    with db_connection() as db:
+        store_rounds(db, rounds)
+    print(f"✓ Calibrated bcrypt cost to {rounds} rounds.")
+
+def create_app():
+    """Builds the Flask app. It does not touch the database or start background work."""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = JWT_SECRET
+    app.register_blueprint(api)
+    app.teardown_appcontext(close_db)
+    app.cli.command('migrate')(migrate_command)
+    app.cli.command('calibrate-bcrypt')(calibrate_bcrypt_command)
+    job_queue.init_app(app)
+    return app
+
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
-        init_db()
+        migrate_command()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,108 @@
+"""In-memory fast path for ``authenticate_token``.
+
+Verified JWT claims are kept in a bounded LRU keyed by a digest of the
+token and expire together with the token. Revoked users (for example
+accounts removed by an admin) are tracked in the ``user_revocations`` table
+and mirrored in memory, refreshed at most once per interval, so revocation
+checks do not cost a database round-trip per request.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+CREATE_REVOCATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS user_revocations (
+        user_id INTEGER PRIMARY KEY,
+        revoked_at REAL NOT NULL
+    );"""
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+
+class TokenCache:
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def get(self, token):
+        key = token_digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, token, claims):
+        expires_at = claims.get('exp')
+        if not isinstance(expires_at, (int, float)):
+            return
+        with self._lock:
+            self._entries[token_digest(token)] = (claims, expires_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, size=len(self._entries), max_size=self.max_size)
+
+
+class RevocationList:
+    """Tokens issued to a user at or before their ``revoked_at`` are rejected.
+
+    ``connection()`` lends a DB connection; the table is re-read at most every
+    ``refresh_interval`` seconds so revocations made by other workers are
+    picked up without querying on every request.
+    """
+
+    def __init__(self, connection, refresh_interval=30.0):
+        self._connection = connection
+        self.refresh_interval = refresh_interval
+        self._revoked = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _refresh_if_stale(self):
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._loaded_at < self.refresh_interval:
+                return
+            self._refreshing = True
+        try:
+            with self._connection() as db:
+                c = db.cursor()
+                c.execute("SELECT user_id, revoked_at FROM user_revocations")
+                revoked = {row[0]: row[1] for row in c.fetchall()}
+            with self._lock:
+                self._revoked = revoked
+        except Exception as e:
+            print(f"Revocation Refresh Error: {str(e)}")
+        finally:
+            with self._lock:
+                self._loaded_at = time.monotonic()
+                self._refreshing = False
+
+    def is_revoked(self, claims):
+        self._refresh_if_stale()
+        revoked_at = self._revoked.get(claims.get('userId'))
+        return revoked_at is not None and claims.get('iat', 0) <= revoked_at
+
+    def revoke(self, c, user_id):
+        """Records a revocation through cursor ``c`` and applies it locally at once."""
+        now = time.time()
+        c.execute("INSERT OR REPLACE INTO user_revocations(user_id, revoked_at) VALUES(?, ?)", (user_id, now))
+        with self._lock:
+            self._revoked[user_id] = now
+
+    def stats(self):
+        with self._lock:
+            return {"revoked_users": len(self._revoked), "refresh_interval": self.refresh_interval}
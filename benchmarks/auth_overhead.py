@@ -0,0 +1,79 @@
+"""Microbenchmark for the per-request cost of authenticate_token.
+
+Compares verifying the JWT on every request (the old path) with the
+verified-token cache plus the in-memory revocation check.
+
+    python benchmarks/auth_overhead.py [iterations]
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from auth_cache import TokenCache, RevocationList
+
+SECRET = 'benchmark-secret-that-is-long-enough-for-hs256'
+
+
+class _EmptyCursor:
+    def execute(self, sql, params=()):
+        pass
+
+    def fetchall(self):
+        return []
+
+
+class _EmptyDB:
+    def cursor(self):
+        return _EmptyCursor()
+
+
+@contextmanager
+def _connection():
+    yield _EmptyDB()
+
+
+def decode_every_time(token):
+    return jwt.decode(token, SECRET, algorithms=["HS256"])
+
+
+def cached(token_cache, revocations):
+    def authenticate(token):
+        data = token_cache.get(token)
+        if data is None:
+            data = jwt.decode(token, SECRET, algorithms=["HS256"])
+            token_cache.put(token, data)
+        revocations.is_revoked(data)
+        return data
+    return authenticate
+
+
+def measure(fn, tokens, iterations):
+    started = time.perf_counter()
+    for i in range(iterations):
+        fn(tokens[i % len(tokens)])
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    now = datetime.utcnow()
+    tokens = [
+        jwt.encode({'userId': i, 'email': f'user{i}@example.com', 'role': 'user', 'iat': now, 'exp': now + timedelta(days=7)}, SECRET, algorithm="HS256")
+        for i in range(100)
+    ]
+
+    before = measure(decode_every_time, tokens, iterations)
+    after = measure(cached(TokenCache(), RevocationList(_connection, refresh_interval=3600)), tokens, iterations)
+
+    print(f"jwt.decode per request:        {before:8.2f} µs")
+    print(f"token cache + revocation check: {after:8.2f} µs")
+    print(f"speed-up:                       {before / after:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""Local stand-in for the OpenRouter chat-completions API.
+
+Answers ``POST .../chat/completions`` with canned course outlines, chapters,
+full courses, career paths or chat replies, picked from the prompt, so the
+app can be load-tested without calling openrouter.ai. Latency, output speed,
+streaming and failures are configurable:
+
+    python benchmarks/fake_openrouter.py --port 8999 --latency 0.8 --error-rate 0.02
+
+Point the app at it with ``OPENROUTER_BASE_URL=http://127.0.0.1:8999/api/v1``.
+``GET /stats`` returns how many requests of each kind were served.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHAPTERS_PER_MODULE = 8
+PAGES_PER_CHAPTER = 4
+PAGE_TEXT = ("This page explains the idea step by step, works through a realistic example and closes with the "
+             "mistakes beginners most often make, so the learner can apply it on their own. ") * 3
+
+
+def page(index):
+    return {"title": f"Page {index}: Topic {index}", "content": PAGE_TEXT}
+
+
+def chapter(title):
+    return {"title": title, "pages": [page(i) for i in range(1, PAGES_PER_CHAPTER + 1)]}
+
+
+def course_header(topic):
+    return {"title": f"Mastering {topic}", "description": f"A hands-on course about {topic}.", "duration": "8 Weeks",
+            "difficulty": "Beginner", "startingSalary": "₹4L - ₹6L / yr", "skills": ["Fundamentals", "Tooling", "Projects", "Testing", "Deployment"]}
+
+
+def chapter_titles(m_idx):
+    return [f"Chapter {m_idx}.{c_idx}: Lesson {c_idx}" for c_idx in range(1, CHAPTERS_PER_MODULE + 1)]
+
+
+def quoted(prompt, marker):
+    """Returns the first double-quoted string after ``marker`` in ``prompt``."""
+    start = prompt.find(marker)
+    if start < 0:
+        return 'the topic'
+    start = prompt.find('"', start + len(marker) - 1)
+    end = prompt.find('"', start + 1)
+    return prompt[start + 1:end] if start >= 0 and end > start else 'the topic'
+
+
+def build_reply(messages, modules):
+    """Returns ``(kind, content)`` for the last user prompt."""
+    prompt = messages[-1].get('content', '') if messages else ''
+    if 'Create the course OUTLINE only' in prompt:
+        outline = course_header(quoted(prompt, 'course about:'))
+        outline['modules'] = [{"title": f"Module {m}: Part {m}", "description": "Overview.", "chapters": chapter_titles(m)} for m in range(1, modules + 1)]
+        return 'outline', json.dumps(outline, ensure_ascii=False)
+    if 'You are writing one chapter' in prompt:
+        return 'chapter', json.dumps(chapter(quoted(prompt, 'Chapter:')), ensure_ascii=False)
+    if 'Give the titles of the next' in prompt:
+        return 'titles', json.dumps({"chapters": chapter_titles(modules)}, ensure_ascii=False)
+    if 'Create a comprehensive course outline' in prompt:
+        course = course_header(quoted(prompt, 'course about:'))
+        course['modules'] = [{"title": f"Module {m}: Part {m}", "description": "Overview.",
+                              "chapters": [chapter(title) for title in chapter_titles(m)]} for m in range(1, modules + 1)]
+        return 'course', json.dumps(course, ensure_ascii=False)
+    if 'career path expert' in prompt:
+        roles = [{"id": i, "title": f"Role {i}", "salary": "₹5L - ₹8L / yr", "stage": ("Entry Level", "Mid Career", "Late Career")[i % 3]} for i in range(1, 10)]
+        return 'career_path', json.dumps({"title": "Career Path", "description": "A typical progression.", "flowchart": {"roles": roles}})
+    if prompt.strip().startswith('Summarize the conversation'):
+        return 'summary', "The user is exploring a career change and asked about skills and learning order."
+    return 'chat', ("Start with the fundamentals, build two small projects and then specialise. "
+                    "For a detailed plan, use the **Course Search** and **Career Path Visualizer** tools on our site.")
+
+
+class FakeOpenRouter:
+    def __init__(self, latency=0.5, jitter=0.2, tokens_per_second=400.0, modules=2, error_rate=0.0,
+                 rate_limit_rate=0.0, truncate_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.modules = modules
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.truncate_rate = truncate_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def _roll(self):
+        with self._lock:
+            return self._random.random(), self._random.uniform(-self.jitter, self.jitter)
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip('/').endswith('/stats'):
+                    with fake._lock:
+                        return self._send(200, json.dumps(fake.counts))
+                self._send(404, json.dumps({"error": {"message": "Not found"}}))
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    return self._send(404, json.dumps({"error": {"message": "Not found"}}))
+                payload = json.loads(body or b'{}')
+                roll, jitter = fake._roll()
+                time.sleep(max(0.0, fake.latency + jitter))
+
+                if roll < fake.error_rate:
+                    fake._count('errors')
+                    return self._send(500, json.dumps({"error": {"message": "Injected upstream failure"}}))
+                if roll < fake.error_rate + fake.rate_limit_rate:
+                    fake._count('rate_limited')
+                    return self._send(429, json.dumps({"error": {"message": "Injected rate limit"}}), {"Retry-After": "1"})
+
+                kind, content = build_reply(payload.get('messages') or [], fake.modules)
+                if payload.get('response_format') and roll > 1 - fake.truncate_rate:
+                    kind, content = f"{kind}_truncated", content[:len(content) // 2]
+                fake._count(kind)
+                prompt_tokens = sum(len(str(m.get('content', ''))) for m in payload.get('messages') or []) // 4
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                         "total_tokens": prompt_tokens + len(content) // 4}
+                if payload.get('stream'):
+                    return self._stream(payload, content, usage)
+
+                time.sleep(len(content) / 4 / fake.tokens_per_second)
+                self._send(200, json.dumps({"id": "fake", "model": payload.get('model'),
+                                            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                                            "usage": usage}))
+
+            def _stream(self, payload, content, usage):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+                def write(text):
+                    data = text.encode('utf-8')
+                    self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                    self.wfile.flush()
+
+                step = 64
+                for i in range(0, len(content), step):
+                    piece = content[i:i + step]
+                    time.sleep(len(piece) / 4 / fake.tokens_per_second)
+                    write("data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": piece}}]}) + "\n\n")
+                if (payload.get('stream_options') or {}).get('include_usage'):
+                    write("data: " + json.dumps({"choices": [], "usage": usage}) + "\n\n")
+                write("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def serve(self, host='127.0.0.1', port=0):
+        """Starts serving on a background thread and returns the ``ThreadingHTTPServer``."""
+        server = ThreadingHTTPServer((host, port), self.handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='fake-openrouter', daemon=True).start()
+        return server
+
+
+def add_arguments(parser):
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds before the first token (default 0.5).')
+    parser.add_argument('--jitter', type=float, default=0.2, help='Random +/- seconds added to the latency (default 0.2).')
+    parser.add_argument('--tokens-per-second', type=float, default=400.0, help='Output speed (default 400).')
+    parser.add_argument('--modules', type=int, default=2, help='Modules per generated course (default 2).')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500.')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 429.')
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help='Fraction of JSON replies cut off halfway.')
+    parser.add_argument('--seed', type=int, default=None)
+
+
+def from_arguments(args):
+    return FakeOpenRouter(latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second, modules=args.modules,
+                          error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, truncate_rate=args.truncate_rate, seed=args.seed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8999)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = from_arguments(args).serve(args.host, args.port)
+    print(f"Fake OpenRouter listening on http://{args.host}:{server.server_address[1]}/api/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
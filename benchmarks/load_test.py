@@ -0,0 +1,367 @@
+"""Load test for the whole app against local stand-ins.
+
+Starts the fake OpenRouter server (``fake_openrouter.py``), points the app
+at a throwaway local SQLite file instead of SQLite Cloud, runs it under
+gunicorn with the production config, seeds users and saved courses, and then
+drives a weighted mix of login, profile, saved-course, chatbot and course
+generation requests at each concurrency level. Throughput and p50/p95/p99
+latency are reported per endpoint.
+
+    python benchmarks/load_test.py --concurrency 1,8,32 --duration 20
+    python benchmarks/load_test.py --output results.json
+    python benchmarks/load_test.py --baseline results.json --tolerance 0.25
+
+With ``--baseline`` the run exits non-zero if any endpoint's p95 grew by
+more than the tolerance, or its error rate rose, at the same concurrency.
+``--url`` targets an app that is already running instead of starting one.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_openrouter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = 'benchmark-password'
+DEFAULT_MIX = 'login=5,profile=25,saved_courses=20,saved_course=10,chatbot=25,generate_course=10,generate_course_stream=5'
+TOPICS = ['python', 'data science', 'web development', 'machine learning', 'cloud computing', 'cyber security',
+          'ui ux design', 'digital marketing', 'java', 'devops']
+QUESTIONS = ['How do I become a data analyst?', 'Which language should I learn first?', 'Is SQL still worth learning?',
+             'How long does it take to learn web development?', 'What does a DevOps engineer do?']
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ACTIONS:
+            raise SystemExit(f"Unknown action '{name.strip()}'. Choose from: {', '.join(ACTIONS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class User:
+    def __init__(self, email):
+        self.email = email
+        self.token = None
+        self.course_ids = []
+        self.session_id = None
+
+    def headers(self):
+        return {'Authorization': f'Bearer {self.token}'}
+
+
+class Client:
+    def __init__(self, base_url, unique_course_ratio):
+        self.base_url = base_url.rstrip('/')
+        self.unique_course_ratio = unique_course_ratio
+        self.session = requests.Session()
+        self.random = random.Random()
+
+    def post(self, path, body, headers=None, **kwargs):
+        return self.session.post(self.base_url + path, json=body, headers=headers, timeout=300, **kwargs)
+
+    def get(self, path, headers=None):
+        return self.session.get(self.base_url + path, headers=headers, timeout=300)
+
+    def course_query(self):
+        topic = self.random.choice(TOPICS)
+        if self.random.random() < self.unique_course_ratio:
+            return f"{topic} for {self.random.randrange(10 ** 9)}"
+        return topic
+
+
+def do_login(client, user):
+    response = client.post('/api/login', {'email': user.email, 'password': PASSWORD})
+    if response.ok:
+        user.token = response.json()['token']
+    return response
+
+
+def do_profile(client, user):
+    return client.get('/api/profile', user.headers())
+
+
+def do_saved_courses(client, user):
+    return client.get('/api/saved-courses?view=summary&limit=20', user.headers())
+
+
+def do_saved_course(client, user):
+    course_id = client.random.choice(user.course_ids) if user.course_ids else 0
+    return client.get(f'/api/saved-courses/{course_id}', user.headers())
+
+
+def do_chatbot(client, user):
+    body = {'query': client.random.choice(QUESTIONS)}
+    if user.session_id:
+        body['sessionId'] = user.session_id
+    response = client.post('/api/chatbot', body, user.headers())
+    if response.ok:
+        user.session_id = response.json().get('sessionId')
+    return response
+
+
+def do_generate_course(client, user):
+    return client.post('/api/generate-course-with-ai', {'query': client.course_query()}, user.headers())
+
+
+def do_generate_course_stream(client, user):
+    response = client.post('/api/generate-course-with-ai?stream=1', {'query': client.course_query()}, user.headers(), stream=True)
+    body = b''.join(response.iter_content(chunk_size=None))
+    if response.ok and b'event: error' in body:
+        response.status_code = 599
+    return response
+
+
+ACTIONS = {
+    'login': do_login,
+    'profile': do_profile,
+    'saved_courses': do_saved_courses,
+    'saved_course': do_saved_course,
+    'chatbot': do_chatbot,
+    'generate_course': do_generate_course,
+    'generate_course_stream': do_generate_course_stream,
+}
+
+
+def seed(base_url, count, courses_per_user, run_id):
+    """Creates ``count`` users with a few saved courses each and logs them in."""
+    client = Client(base_url, 0)
+    users = []
+    sample = fake_openrouter.course_header('benchmarking')
+    sample['modules'] = [{"title": "Module 1: Part 1", "description": "Overview.",
+                          "chapters": [fake_openrouter.chapter(title) for title in fake_openrouter.chapter_titles(1)]}]
+    for i in range(count):
+        user = User(f"bench-{run_id}-{i}@example.com")
+        client.post('/api/signup', {'fullName': f'Bench User {i}', 'email': user.email, 'password': PASSWORD, 'confirmPassword': PASSWORD})
+        response = do_login(client, user)
+        if not response.ok:
+            raise SystemExit(f"Could not log in seeded user {user.email}: {response.status_code} {response.text[:200]}")
+        for j in range(courses_per_user):
+            client.post('/api/saved-courses', {'courseData': dict(sample, title=f"Saved Course {j}")}, user.headers())
+        listing = client.get('/api/saved-courses?view=summary&limit=50', user.headers()).json()
+        user.course_ids = [course['id'] for course in listing.get('courses', [])]
+        users.append(user)
+    return users
+
+
+def run_level(base_url, users, mix, concurrency, duration, warmup, unique_course_ratio):
+    """Runs ``concurrency`` closed-loop clients for ``warmup + duration`` seconds; returns per-action samples."""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = {name: [] for name in names}
+    lock = threading.Lock()
+    started = time.perf_counter()
+    record_from = started + warmup
+    stop_at = record_from + duration
+
+    def worker(index):
+        client = Client(base_url, unique_course_ratio)
+        user = users[index % len(users)]
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            name = client.random.choices(names, weights)[0]
+            began = time.perf_counter()
+            try:
+                response = ACTIONS[name](client, user)
+                ok, status = response.ok, response.status_code
+            except requests.RequestException as e:
+                ok, status = False, type(e).__name__
+            elapsed = time.perf_counter() - began
+            if began >= record_from:
+                with lock:
+                    samples[name].append((elapsed, ok, status))
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples, duration):
+    report = {}
+    for name, rows in samples.items():
+        if not rows:
+            continue
+        latencies = sorted(row[0] for row in rows)
+        errors = [row[2] for row in rows if not row[1]]
+        report[name] = {
+            "requests": len(rows),
+            "errors": len(errors),
+            "error_rate": round(len(errors) / len(rows), 4),
+            "error_statuses": sorted({str(status) for status in errors}),
+            "rps": round(len(rows) / duration, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        }
+    total = sum(len(rows) for rows in samples.values())
+    return {"endpoints": report, "total_rps": round(total / duration, 2)}
+
+
+def print_report(concurrency, summary):
+    print(f"\nConcurrency {concurrency}: {summary['total_rps']} req/s total")
+    print(f"  {'endpoint':<24}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in summary['endpoints'].items():
+        print(f"  {name:<24}{row['requests']:>9}{row['errors']:>8}{row['rps']:>9}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}"
+              + (f"  {','.join(row['error_statuses'])}" if row['errors'] else ''))
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of regressions of ``results`` against ``baseline``."""
+    regressions = []
+    for level, summary in results['levels'].items():
+        previous = baseline.get('levels', {}).get(level)
+        if not previous:
+            continue
+        for name, row in summary['endpoints'].items():
+            before = previous['endpoints'].get(name)
+            if not before:
+                continue
+            if before['p95_ms'] > 0 and row['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                regressions.append(f"concurrency {level} {name}: p95 {before['p95_ms']}ms -> {row['p95_ms']}ms")
+            if row['error_rate'] > before['error_rate'] + 0.01:
+                regressions.append(f"concurrency {level} {name}: error rate {before['error_rate']} -> {row['error_rate']}")
+    return regressions
+
+
+def wait_until_healthy(base_url, process=None, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"The app exited with status {process.returncode} during startup.")
+        try:
+            if requests.get(base_url + '/health', timeout=2).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise SystemExit(f"The app did not become healthy at {base_url} within {timeout}s.")
+
+
+def app_environment(args, workdir, upstream_url):
+    env = dict(os.environ)
+    env.pop('SQLITECLOUD_CONNECTION_STRING', None)
+    env.update({
+        'LOCAL_SQLITE_PATH': os.path.join(workdir, 'app.db'),
+        'JWT_SECRET': 'benchmark-secret-that-is-long-enough-for-hs256',
+        'OPENROUTER_API_KEY': 'benchmark',
+        'OPENROUTER_BASE_URL': upstream_url,
+        'PORT': str(args.port),
+        'WEB_CONCURRENCY': str(args.workers),
+        'WEB_WORKER_CLASS': args.worker_class,
+        'BCRYPT_LOG_ROUNDS': str(args.bcrypt_rounds),
+        'RATE_LIMIT_STORE': 'memory',
+    })
+    # The benchmark users share one IP and issue far more requests than a person would.
+    for name in ('GENERATION_BURST', 'GENERATION_IP_BURST', 'CHAT_BURST', 'CHAT_IP_BURST'):
+        env[f'RATE_LIMIT_{name}'] = '1000000'
+    for name in ('GENERATION_PER_HOUR', 'GENERATION_IP_PER_HOUR', 'CHAT_PER_MINUTE', 'CHAT_IP_PER_MINUTE'):
+        env[f'RATE_LIMIT_{name}'] = '100000000'
+    for name in ('GENERATION_CONCURRENT', 'CHAT_CONCURRENT'):
+        env[f'RATE_LIMIT_{name}'] = '1000'
+    return env
+
+
+def start_app(env):
+    # Same two steps as the Procfile: the release-phase migration, then the web process.
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'migrate'], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+    return subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:create_app()'], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=None if os.environ.get('BENCHMARK_APP_LOGS') else subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated client counts (default 1,8,32).')
+    parser.add_argument('--duration', type=float, default=20, help='Measured seconds per level (default 20).')
+    parser.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds before each level (default 3).')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Action weights (default {DEFAULT_MIX}).')
+    parser.add_argument('--users', type=int, default=20, help='Seeded users (default 20).')
+    parser.add_argument('--saved-courses', type=int, default=5, help='Saved courses per seeded user (default 5).')
+    parser.add_argument('--unique-course-ratio', type=float, default=0.5, help='Share of course queries that miss the cache (default 0.5).')
+    parser.add_argument('--url', help='Benchmark an already running app instead of starting one.')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers (default 2).')
+    parser.add_argument('--worker-class', default='gevent')
+    parser.add_argument('--bcrypt-rounds', type=int, default=10)
+    parser.add_argument('--upstream-port', type=int, default=0)
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    parser.add_argument('--baseline', help='Compare against results written earlier with --output.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 growth against the baseline (default 0.25).')
+    fake_openrouter.add_arguments(parser)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    upstream = fake_openrouter.from_arguments(args)
+    upstream_server = upstream.serve(port=args.upstream_port)
+    upstream_url = f"http://127.0.0.1:{upstream_server.server_address[1]}/api/v1"
+
+    workdir = tempfile.mkdtemp(prefix='course2career-bench-')
+    process = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+            print(f"Benchmarking {base_url} (it must use {upstream_url} as OPENROUTER_BASE_URL for AI routes).")
+        else:
+            base_url = f"http://127.0.0.1:{args.port}"
+            process = start_app(app_environment(args, workdir, upstream_url))
+        wait_until_healthy(base_url, process)
+
+        users = seed(base_url, args.users, args.saved_courses, int(time.time()))
+        print(f"Seeded {len(users)} users; upstream latency {args.latency}s, {args.workers} {args.worker_class} workers.")
+
+        results = {"config": {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')}, "levels": {}}
+        for concurrency in levels:
+            samples = run_level(base_url, users, mix, concurrency, args.duration, args.warmup, args.unique_course_ratio)
+            summary = summarize(samples, args.duration)
+            results['levels'][str(concurrency)] = summary
+            print_report(concurrency, summary)
+        results['upstream_requests'] = dict(upstream.counts)
+        print(f"\nUpstream requests: {json.dumps(upstream.counts, sort_keys=True)}")
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+        if args.baseline:
+            with open(args.baseline) as f:
+                regressions = compare(results, json.load(f), args.tolerance)
+            if regressions:
+                print("\nRegressions against the baseline:\n  " + "\n  ".join(regressions))
+                sys.exit(1)
+            print("\nNo regressions against the baseline.")
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        upstream_server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Server-side chat sessions with a token budget.
+
+Clients send only the new message and a session id; the transcript lives in
+``chat_sessions``/``chat_messages``. Every request is assembled newest-first
+until the token budget is used up. Older turns are folded into a running
+summary (or dropped if summarizing fails) and never re-read, so the prompt
+sent upstream stays bounded no matter how long the conversation runs.
+"""
+import re
+import time
+import uuid
+
+CREATE_CHAT_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS chat_sessions (
+        id TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        summary TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+    );""",
+    """
+    CREATE TABLE IF NOT EXISTS chat_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        tokens INTEGER NOT NULL,
+        summarized INTEGER DEFAULT 0 NOT NULL,
+        created_at REAL NOT NULL,
+        FOREIGN KEY (session_id) REFERENCES chat_sessions (id) ON DELETE CASCADE
+    );""",
+    "CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, summarized, id);",
+    "CREATE INDEX IF NOT EXISTS idx_chat_sessions_user ON chat_sessions (user_id, updated_at);",
+]
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+SUMMARY_PROMPT = """
+    Summarize the conversation below between a user and the Course2Career Assistant in at most {words} words.
+    Keep the user's goals, skills, background and any open questions. Reply with the summary only.
+
+    {transcript}
+"""
+
+
+def estimate_tokens(text):
+    """Cheap local token estimate: word/punctuation pieces or one token per four characters, whichever is larger."""
+    if not text:
+        return 0
+    return max(len(TOKEN_PATTERN.findall(text)), len(text) // 4) + 4
+
+
+class ConversationManager:
+    def __init__(self, connection, summarize=None, token_budget=2000, summary_words=120):
+        """``summarize(messages)`` must return ``(text, error)`` like ``generate_ai_content``."""
+        self._connection = connection
+        self._summarize = summarize
+        self.token_budget = token_budget
+        self.summary_words = summary_words
+
+    def ensure_session(self, user_id, session_id=None):
+        """Returns ``session_id`` if the user owns it, a new id if none was given, or None."""
+        with self._connection() as db:
+            c = db.cursor()
+            if session_id:
+                c.execute("SELECT id FROM chat_sessions WHERE id = ? AND user_id = ?", (session_id, user_id))
+                return session_id if c.fetchone() else None
+            session_id = uuid.uuid4().hex
+            now = time.time()
+            c.execute("INSERT INTO chat_sessions(id, user_id, created_at, updated_at) VALUES(?, ?, ?, ?)", (session_id, user_id, now, now))
+            db.commit()
+            return session_id
+
+    def window(self, system_prompt, history, user_query):
+        """Trims a client-supplied history to the token budget, dropping the oldest turns."""
+        budget = self.token_budget - estimate_tokens(system_prompt) - estimate_tokens(user_query)
+        kept = []
+        for turn in reversed(history):
+            if not isinstance(turn, dict) or turn.get('role') not in ('user', 'assistant'):
+                continue
+            content = str(turn.get('content', ''))
+            budget -= estimate_tokens(content)
+            if budget < 0:
+                break
+            kept.append({"role": turn['role'], "content": content})
+        kept.reverse()
+        return [{"role": "system", "content": system_prompt}] + kept + [{"role": "user", "content": user_query}]
+
+    def build_messages(self, session_id, system_prompt, user_query):
+        with self._connection() as db:
+            c = db.cursor()
+            c.execute("SELECT summary FROM chat_sessions WHERE id = ?", (session_id,))
+            row = c.fetchone()
+            summary = row[0] if row else None
+            c.execute("SELECT id, role, content, tokens FROM chat_messages WHERE session_id = ? AND summarized = 0 ORDER BY id", (session_id,))
+            turns = [tuple(turn) for turn in c.fetchall()]
+
+        budget = self.token_budget - estimate_tokens(system_prompt) - estimate_tokens(user_query) - estimate_tokens(summary)
+        if sum(turn[3] for turn in turns) > budget:
+            # Compact down to half the budget so the next few turns fit without another summary call.
+            budget //= 2
+        kept = 0
+        for turn in reversed(turns):
+            if budget - turn[3] < 0:
+                break
+            budget -= turn[3]
+            kept += 1
+        recent = turns[len(turns) - kept:]
+        overflow = turns[:len(turns) - kept]
+        if overflow:
+            summary = self._compact(session_id, summary, overflow)
+
+        messages = [{"role": "system", "content": system_prompt}]
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        messages.extend({"role": role, "content": content} for _, role, content, _ in recent)
+        messages.append({"role": "user", "content": user_query})
+        return messages
+
+    def _compact(self, session_id, summary, overflow):
+        """Folds ``overflow`` turns into the session summary, or drops them if that fails."""
+        new_summary = summary
+        if self._summarize:
+            transcript = "\n".join(f"{role}: {content}" for _, role, content, _ in overflow)
+            if summary:
+                transcript = f"Earlier summary: {summary}\n{transcript}"
+            prompt = SUMMARY_PROMPT.format(words=self.summary_words, transcript=transcript)
+            text, error = self._summarize([{"role": "user", "content": prompt}])
+            if not error and text:
+                new_summary = ' '.join(text.split()[:self.summary_words * 2])
+
+        placeholders = ', '.join('?' for _ in overflow)
+        with self._connection() as db:
+            c = db.cursor()
+            c.execute(f"UPDATE chat_messages SET summarized = 1 WHERE id IN ({placeholders})", tuple(turn[0] for turn in overflow))
+            c.execute("UPDATE chat_sessions SET summary = ?, updated_at = ? WHERE id = ?", (new_summary, time.time(), session_id))
+            db.commit()
+        return new_summary
+
+    def record_turn(self, session_id, user_query, response_text):
+        now = time.time()
+        with self._connection() as db:
+            c = db.cursor()
+            for role, content in (("user", user_query), ("assistant", response_text)):
+                c.execute("INSERT INTO chat_messages(session_id, role, content, tokens, created_at) VALUES(?, ?, ?, ?, ?)",
+                          (session_id, role, content, estimate_tokens(content), now))
+            c.execute("UPDATE chat_sessions SET updated_at = ? WHERE id = ?", (now, session_id))
+            db.commit()
@@ -0,0 +1,290 @@
+"""Two-phase course generation.
+
+Instead of asking one model call for the whole course, the pipeline first
+requests a lightweight outline (course metadata plus module and chapter
+titles) and then fills in every chapter's pages through a bounded thread
+pool. Chapters that fail are retried on their own, so wall-clock time is
+roughly the outline plus the slowest chapter rather than the sum of them all.
+
+The same chapter fan-out completes single-call courses that came back
+truncated or with broken chapters: whatever parsed is kept and only the
+missing chapters (and, if needed, their titles) are requested again. The
+modules a truncated reply never reached are taken from an outline call.
+"""
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from prompts import PromptTemplate
+
+CHAPTERS_PER_MODULE = 8
+PAGES_PER_CHAPTER = 4
+
+
+OUTLINE_PROMPT = PromptTemplate("""
+        You are an expert course creator who ONLY responds in valid JSON.
+        A user wants a detailed course about: "{user_query}".
+        Create the course OUTLINE only, with the following JSON structure. Each module must contain {chapters_per_module} chapter titles. Do not write any page content.
+
+        {{
+        "title": "Course Title", "description": "Engaging 2-3 sentence description.",
+        "duration": "e.g., '8 Weeks'", "difficulty": "Beginner, Intermediate, or Advanced",
+        "startingSalary": "Realistic starting salary in INR (e.g., '₹4L - ₹6L / yr')",
+        "skills": ["5-7 relevant skills"],
+        "modules": [
+            {{
+            "title": "Module 1: [Module Title]", "description": "Brief overview of the module.",
+            "chapters": ["Chapter 1.1: [Chapter Title]", "Chapter 1.2: [Chapter Title]", "..."]
+            }}
+          ]
+        }}
+    """, chapters_per_module=CHAPTERS_PER_MODULE)
+
+CHAPTER_PROMPT = PromptTemplate("""
+        You are an expert course creator who ONLY responds in valid JSON.
+        You are writing one chapter of the course "{course_title}" ({difficulty} level).
+        Module: "{module_title}" - {module_description}
+        Chapter: "{chapter_title}"
+        Write exactly {pages_per_chapter} pages for this chapter. The 'content' for each page should be a detailed, educational paragraph.
+
+        {{
+        "title": "{chapter_title}",
+        "pages": [
+            {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
+          ]
+        }}
+    """, pages_per_chapter=PAGES_PER_CHAPTER)
+
+MISSING_TITLES_PROMPT = PromptTemplate("""
+        You are an expert course creator who ONLY responds in valid JSON.
+        You are completing the course "{course_title}" ({difficulty} level).
+        Module: "{module_title}" - {module_description}
+        It already has these chapters: {existing}
+        Give the titles of the next {count} chapters of this module, continuing the numbering.
+
+        {{"chapters": ["Chapter X.Y: [Chapter Title]"]}}
+    """)
+
+
+def _messages(prompt):
+    return [{"role": "system", "content": "You are a course creation expert that only outputs JSON."}, {"role": "user", "content": prompt}]
+
+
+def _module_context(user_query, outline, module):
+    return {"course_title": outline.get('title', user_query), "difficulty": outline.get('difficulty', 'Beginner'),
+            "module_title": module.get('title', ''), "module_description": module.get('description', '')}
+
+
+def build_outline_messages(user_query):
+    return _messages(OUTLINE_PROMPT.render(user_query=user_query))
+
+
+def build_chapter_messages(user_query, outline, module, chapter_title):
+    return _messages(CHAPTER_PROMPT.render(chapter_title=chapter_title, **_module_context(user_query, outline, module)))
+
+
+def build_missing_titles_messages(user_query, outline, module, count):
+    existing = [title for title in module.get('chapters', []) if title]
+    return _messages(MISSING_TITLES_PROMPT.render(existing=json.dumps(existing, ensure_ascii=False), count=count,
+                                                  **_module_context(user_query, outline, module)))
+
+
+def _chapter_title(chapter):
+    if isinstance(chapter, dict):
+        return str(chapter.get('title', '')).strip()
+    return str(chapter).strip()
+
+
+def validate_outline(outline):
+    if not isinstance(outline, dict) or not outline.get('title'):
+        return False
+    modules = outline.get('modules')
+    if not isinstance(modules, list) or not modules:
+        return False
+    return all(isinstance(m, dict) and isinstance(m.get('chapters'), list) and m['chapters'] for m in modules)
+
+
+def validate_chapter(chapter):
+    if not isinstance(chapter, dict):
+        return False
+    pages = chapter.get('pages')
+    if not isinstance(pages, list) or not pages:
+        return False
+    return all(isinstance(p, dict) and p.get('title') and p.get('content') for p in pages)
+
+
+def chapter_jobs(outline):
+    """Yields ``(module_index, chapter_index, module, chapter_title)`` for every chapter in the outline."""
+    for m_idx, module in enumerate(outline['modules']):
+        for c_idx, chapter in enumerate(module['chapters']):
+            yield m_idx, c_idx, module, _chapter_title(chapter)
+
+
+def assemble_course(outline, chapters):
+    """Builds the final course document from the outline and ``{(m, c): chapter}``."""
+    course = {key: value for key, value in outline.items() if key != 'modules'}
+    course['modules'] = []
+    for m_idx, module in enumerate(outline['modules']):
+        assembled = {key: value for key, value in module.items() if key != 'chapters'}
+        assembled['chapters'] = []
+        for c_idx, chapter in enumerate(module['chapters']):
+            data = dict(chapters[(m_idx, c_idx)])
+            data['title'] = _chapter_title(chapter) or data.get('title', '')
+            assembled['chapters'].append(data)
+        course['modules'].append(assembled)
+    return course
+
+
+def salvage_course(course, truncated=False):
+    """Splits a single-call course, possibly repaired after truncation, into an outline and its usable chapters.
+
+    Modules without a title and chapters without a title are dropped. When
+    the reply was ``truncated``, the last module (the one that was cut short)
+    is padded to ``CHAPTERS_PER_MODULE`` with untitled slots. Returns
+    ``(outline, {(m, c): chapter})``, or ``(None, {})`` if nothing usable is left.
+    """
+    if not isinstance(course, dict) or not course.get('title'):
+        return None, {}
+    outline = {key: value for key, value in course.items() if key != 'modules'}
+    outline['modules'] = []
+    chapters = {}
+    modules = [m for m in course.get('modules') or [] if isinstance(m, dict) and m.get('title')]
+    for m_idx, module in enumerate(modules):
+        titles = []
+        for chapter in module.get('chapters') or []:
+            title = _chapter_title(chapter) if isinstance(chapter, (dict, str)) else ''
+            if not title:
+                continue
+            if validate_chapter(chapter):
+                chapters[(m_idx, len(titles))] = chapter
+            titles.append(title)
+        if truncated and m_idx == len(modules) - 1:
+            titles += [''] * (CHAPTERS_PER_MODULE - len(titles))
+        outline['modules'].append(dict({key: value for key, value in module.items() if key != 'chapters'}, chapters=titles))
+    if not outline['modules'] or not outline['modules'][0]['chapters']:
+        return None, {}
+    return outline, chapters
+
+
+def complete_titles(user_query, outline, generate):
+    """Asks for the titles of untitled chapter slots; slots that stay untitled are removed.
+
+    Untitled slots only ever trail the last module, so removing them never
+    shifts the index of a chapter that was already kept.
+    """
+    module = outline['modules'][-1]
+    missing = module['chapters'].count('')
+    if not missing:
+        return outline
+    titles, error = generate(build_missing_titles_messages(user_query, outline, module, missing), True)
+    new_titles = []
+    if not error and isinstance(titles, dict) and isinstance(titles.get('chapters'), list):
+        new_titles = [_chapter_title(title) for title in titles['chapters'] if _chapter_title(title)][:missing]
+    module['chapters'] = [title for title in module['chapters'] if title] + new_titles
+    if not module['chapters']:
+        outline['modules'].pop()
+    return outline
+
+
+def extend_outline(user_query, outline, generate):
+    """Appends the modules a truncated reply never reached, taken from a fresh outline call.
+
+    Modules are matched by position, so the ones already salvaged are kept
+    as they are. Returns False if the outline call failed.
+    """
+    fresh, error = generate(build_outline_messages(user_query), True)
+    if error or not validate_outline(fresh):
+        return False
+    for module in fresh['modules'][len(outline['modules']):]:
+        titles = [_chapter_title(chapter) for chapter in module['chapters'] if _chapter_title(chapter)]
+        if titles:
+            outline['modules'].append(dict({key: value for key, value in module.items() if key != 'chapters'}, chapters=titles))
+    return True
+
+
+def fill_chapters(user_query, outline, generate, chapters=None, max_workers=4, max_retries=1, on_progress=None):
+    """Generates every chapter of ``outline`` that is not already in ``chapters`` and assembles the course.
+
+    ``generate(messages, is_json_response)`` must behave like
+    ``generate_ai_content`` and return ``(data, error)``. Returns the same
+    ``(course, error)`` pair. ``on_progress(done, total)`` is called after
+    every finished chapter.
+    """
+    chapters = dict(chapters or {})
+    total = sum(len(module['chapters']) for module in outline['modules'])
+    pending = [job for job in chapter_jobs(outline) if (job[0], job[1]) not in chapters]
+    last_error = None
+    if not pending:
+        return assemble_course(outline, chapters), None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as executor:
+        for attempt in range(max_retries + 1):
+            # Each chapter call runs in a copy of the caller's context so its spans join the request trace.
+            futures = {
+                executor.submit(contextvars.copy_context().run, generate, build_chapter_messages(user_query, outline, module, title), True): (m_idx, c_idx, module, title)
+                for m_idx, c_idx, module, title in pending
+            }
+            failed = []
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    chapter, error = future.result()
+                except Exception as e:
+                    chapter, error = None, ({"error": "An AI communication error occurred."}, 500)
+                    print(f"Chapter Generation Error: {str(e)}")
+                if error or not validate_chapter(chapter):
+                    last_error = error or last_error
+                    failed.append(job)
+                    continue
+                chapters[(job[0], job[1])] = chapter
+                if on_progress:
+                    on_progress(len(chapters), total)
+            if not failed or attempt == max_retries:
+                break
+            print(f"Retrying {len(failed)} of {total} chapters (attempt {attempt + 2}).")
+            pending = failed
+
+    if len(chapters) < total:
+        missing = total - len(chapters)
+        body = {"error": f"Could not generate {missing} of {total} chapters. Please try again."}
+        return None, (body, last_error[1] if last_error else 500)
+
+    return assemble_course(outline, chapters), None
+
+
+def generate_course_parallel(user_query, generate, max_workers=4, max_retries=1, on_progress=None):
+    """Generates a full course with an outline call and a bounded chapter fan-out."""
+    outline, error = generate(build_outline_messages(user_query), True)
+    if error:
+        return None, error
+    if not validate_outline(outline):
+        print(f"Course Outline Error: unexpected outline - {json.dumps(outline)[:500]}")
+        return None, ({"error": "The AI returned an invalid format. Please try again."}, 500)
+    return fill_chapters(user_query, outline, generate, max_workers=max_workers, max_retries=max_retries, on_progress=on_progress)
+
+
+def complete_course(user_query, course, generate, truncated=False, max_workers=4, max_retries=1, on_progress=None):
+    """Keeps the usable part of a single-call course and re-requests only what is missing.
+
+    Falls back to the full two-phase pipeline when not even one titled
+    module survived. Returns ``(course, error, complete)``; ``complete`` is
+    False when a truncated reply could not be extended with the modules it
+    never reached, so the course is shorter than the model intended.
+    """
+    outline, chapters = salvage_course(course, truncated)
+    if outline is None:
+        print("Course Salvage: nothing usable in the response, generating from an outline instead.")
+        return generate_course_parallel(user_query, generate, max_workers, max_retries, on_progress) + (True,)
+    missing = sum(len(module['chapters']) for module in outline['modules']) - len(chapters)
+    if missing:
+        print(f"Course Salvage: kept {len(chapters)} chapters, re-requesting {missing}.")
+        outline = complete_titles(user_query, outline, generate)
+        if not outline['modules']:
+            return None, ({"error": "The AI returned an invalid format. Please try again."}, 500), False
+    complete = True
+    if truncated:
+        kept = len(outline['modules'])
+        complete = extend_outline(user_query, outline, generate)
+        print(f"Course Salvage: kept {kept} modules, " + (f"added {len(outline['modules']) - kept} from an outline." if complete else "could not fetch the rest."))
+    course, error = fill_chapters(user_query, outline, generate, chapters, max_workers, max_retries, on_progress)
+    return course, error, complete
@@ -0,0 +1,146 @@
+"""Thread-safe connection pool for SQLite Cloud.
+
+Opening a SQLite Cloud connection costs a network handshake and an auth
+round-trip, so connections are kept open and handed out per request.
+Idle connections are health-checked on checkout, recycled after
+``max_lifetime`` seconds and replaced when they turn out to be dead.
+"""
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class ConnectionPool:
+    def __init__(self, connect, size=5, max_lifetime=1800.0, checkout_timeout=10.0, health_check_interval=30.0):
+        self._connect = connect
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self._idle = deque()
+        self._born = {}
+        self._open = 0
+        self._cond = threading.Condition()
+        self._counters = {"checkouts": 0, "created": 0, "recycled": 0, "health_check_failures": 0, "discarded": 0, "timeouts": 0, "waits": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _is_alive(self, conn, idle_for):
+        is_connected = getattr(conn, 'is_connected', None)
+        if is_connected is not None and not is_connected():
+            return False
+        if idle_for < self.health_check_interval:
+            return True
+        try:
+            conn.cursor().execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        self._born.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters["timeouts"] += 1
+                    raise PoolTimeoutError(f"No database connection available after {self.checkout_timeout}s.")
+                waited = True
+                self._cond.wait(remaining)
+
+        wait = time.monotonic() - started
+        now = time.monotonic()
+        try:
+            if conn is not None:
+                if now - self._born.get(id(conn), now) > self.max_lifetime:
+                    self._discard(conn)
+                    self._count("recycled")
+                    conn = None
+                elif not self._is_alive(conn, now - last_used):
+                    self._discard(conn)
+                    self._count("health_check_failures")
+                    conn = None
+            if conn is None:
+                conn = self._connect()
+                self._born[id(conn)] = time.monotonic()
+                self._count("created")
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._counters["checkouts"] += 1
+            if waited:
+                self._counters["waits"] += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+        return conn
+
+    def release(self, conn):
+        """Returns a connection to the pool, or drops it if it has been disconnected.
+
+        Uncommitted work is rolled back first, so it can never be committed
+        by the next borrower.
+        """
+        is_connected = getattr(conn, 'is_connected', None)
+        alive = True
+        if is_connected is not None:
+            try:
+                alive = is_connected()
+            except Exception:
+                alive = False
+        if alive:
+            try:
+                conn.rollback()
+            except Exception:
+                alive = False
+        if not alive:
+            self._discard(conn)
+        with self._cond:
+            if alive:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._open -= 1
+                self._counters["discarded"] += 1
+            self._cond.notify()
+
+    def _count(self, name):
+        with self._cond:
+            self._counters[name] += 1
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._counters)
+            idle = len(self._idle)
+            stats.update({
+                "size": self.size,
+                "open": self._open,
+                "idle": idle,
+                "in_use": self._open - idle,
+                "utilisation": round((self._open - idle) / self.size, 4) if self.size else 0.0,
+                "wait_ms_avg": round(self._wait_total / stats["checkouts"] * 1000, 3) if stats["checkouts"] else 0.0,
+                "wait_ms_max": round(self._wait_max * 1000, 3),
+            })
+        return stats
@@ -0,0 +1,24 @@
+# Gunicorn settings for Course2Career.
+#
+# By default the app runs on gevent workers: every socket call (OpenRouter,
+# SQLite Cloud) yields to other requests, so one worker process can keep
+# hundreds of model calls in flight while login and profile requests keep
+# being served. Set WEB_WORKER_CLASS=sync to fall back to one request per
+# worker.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gevent')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 4)))
+worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS', 500))
+
+# Sync workers are killed if a single request outlives the timeout, so it has
+# to cover the slowest model call. Async workers only need it for heartbeats.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30 if worker_class == 'gevent' else 150))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+if worker_class == 'gevent':
+    # Let each worker keep enough upstream connections alive for its in-flight calls.
+    os.environ.setdefault('OPENROUTER_POOL_SIZE', str(min(worker_connections, 200)))
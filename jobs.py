@@ -0,0 +1,241 @@
+"""Background generation jobs.
+
+A POST enqueues a job row in ``generation_jobs`` and returns right away; a
+local worker pool runs the generation and writes progress and the result
+back to the table, where the status endpoint reads them. Rows survive a
+restart: every worker heartbeats the jobs it owns and periodically reclaims
+jobs whose owner stopped updating them. Identical requests share one
+execution: a job whose query is already pending on another worker is
+handed to that worker's owner and finishes with its result. Finished jobs
+are purged after ``retention`` seconds.
+"""
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+CREATE_JOBS_TABLE = """
+    CREATE TABLE IF NOT EXISTS generation_jobs (
+        id TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        query TEXT NOT NULL,
+        dedupe_key TEXT NOT NULL,
+        status TEXT DEFAULT 'queued' NOT NULL,
+        progress REAL DEFAULT 0 NOT NULL,
+        result TEXT,
+        error TEXT,
+        owner TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+    );"""
+
+CREATE_JOBS_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_generation_jobs_status ON generation_jobs (status, updated_at);",
+    "CREATE INDEX IF NOT EXISTS idx_generation_jobs_user ON generation_jobs (user_id, created_at);",
+]
+
+
+class TooManyJobsError(Exception):
+    """Raised by ``JobQueue.submit`` when a user already has the maximum number of pending jobs."""
+
+
+class JobQueue:
+    """Runs ``handlers[kind](query, on_progress)`` on a thread pool.
+
+    Handlers return ``(data, error)`` like ``generate_ai_content`` and run
+    inside ``app.app_context()``. ``connection()`` is a context manager that
+    lends a DB connection for one statement, so a job never holds one while
+    it waits on the model.
+    """
+
+    def __init__(self, app, connection, handlers, max_workers=4, stale_after=300, recover_interval=60, retention=24 * 3600):
+        self.app = app
+        self._connection = connection
+        self.handlers = handlers
+        self.max_workers = max_workers
+        self.stale_after = stale_after
+        self.recover_interval = recover_interval
+        self.retention = retention
+        self.owner = uuid.uuid4().hex
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='generation-job')
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def init_app(self, app):
+        """Binds the queue to the app built by ``create_app``."""
+        self.app = app
+
+    def start(self):
+        """Starts the background thread that reclaims abandoned jobs."""
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._recover_loop, name='generation-job-recovery', daemon=True).start()
+
+    def _execute(self, sql, params=()):
+        with self._connection() as db:
+            c = db.cursor()
+            c.execute(sql, params)
+            rows = c.fetchall() if c.description else []
+            db.commit()
+            return rows, c.rowcount
+
+    def submit(self, user_id, kind, query, dedupe_key, max_pending=None):
+        """Creates a job for ``user_id`` and returns its id.
+
+        A user repeating a query that is still pending gets the existing job
+        back; other users asking for it join the in-flight execution, on
+        whichever worker it runs. Raises
+        ``TooManyJobsError`` when the user already has ``max_pending`` jobs
+        queued or running.
+        """
+        rows, _ = self._execute(
+            "SELECT id FROM generation_jobs WHERE user_id = ? AND dedupe_key = ? AND status IN ('queued', 'running') ORDER BY created_at DESC LIMIT 1",
+            (user_id, dedupe_key),
+        )
+        if rows:
+            return rows[0][0]
+        if max_pending is not None:
+            rows, _ = self._execute("SELECT COUNT(*) FROM generation_jobs WHERE user_id = ? AND status IN ('queued', 'running')", (user_id,))
+            if rows[0][0] >= max_pending:
+                raise TooManyJobsError(f"User {user_id} already has {rows[0][0]} pending jobs.")
+
+        rows, _ = self._execute(
+            "SELECT owner FROM generation_jobs WHERE dedupe_key = ? AND status IN ('queued', 'running') AND owner IS NOT ? ORDER BY created_at LIMIT 1",
+            (dedupe_key, self.owner),
+        )
+        owner = rows[0][0] if rows else self.owner
+
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO generation_jobs(id, user_id, kind, query, dedupe_key, owner, created_at, updated_at) VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, user_id, kind, query, dedupe_key, owner, now, now),
+        )
+        if owner != self.owner and self._joined(job_id, dedupe_key, owner):
+            return job_id
+        self._enqueue(job_id, kind, query, dedupe_key)
+        return job_id
+
+    def _joined(self, job_id, dedupe_key, owner):
+        """Checks that the execution on ``owner`` will also finish ``job_id``; otherwise takes the job back.
+
+        The owner finishes every pending row with the dedupe key, so the job
+        is covered as long as another of those rows is still pending after
+        the insert, or the owner already finished this one.
+        """
+        rows, _ = self._execute("SELECT status FROM generation_jobs WHERE id = ?", (job_id,))
+        if rows and rows[0][0] not in ('queued', 'running'):
+            return True
+        rows, _ = self._execute(
+            "SELECT 1 FROM generation_jobs WHERE dedupe_key = ? AND owner = ? AND status IN ('queued', 'running') AND id != ? LIMIT 1",
+            (dedupe_key, owner, job_id),
+        )
+        if rows:
+            return True
+        _, claimed = self._execute("UPDATE generation_jobs SET owner = ? WHERE id = ? AND status = 'queued'", (self.owner, job_id))
+        return claimed != 1
+
+    def _enqueue(self, job_id, kind, query, dedupe_key):
+        with self._lock:
+            group = self._inflight.get(dedupe_key)
+            if group is not None:
+                group.append(job_id)
+                return
+            self._inflight[dedupe_key] = [job_id]
+        self._executor.submit(self._run, kind, query, dedupe_key)
+
+    def _update_pending(self, dedupe_key, sql, params):
+        # Covers the local group and any jobs other workers handed to this owner.
+        self._execute(sql + " WHERE dedupe_key = ? AND owner = ? AND status IN ('queued', 'running')", tuple(params) + (dedupe_key, self.owner))
+
+    def _run(self, kind, query, dedupe_key):
+        with self.app.app_context():
+            try:
+                self._update_pending(dedupe_key, "UPDATE generation_jobs SET status = 'running', updated_at = ?", (time.time(),))
+
+                def on_progress(done, total):
+                    progress = round(done / total, 4) if total else 0
+                    self._update_pending(dedupe_key, "UPDATE generation_jobs SET progress = ?, updated_at = ?", (progress, time.time()))
+
+                data, error = self.handlers[kind](query, on_progress)
+            except Exception as e:
+                print(f"Generation Job Error: {str(e)}")
+                data, error = None, ({"error": "An error occurred while generating. Please try again."}, 500)
+
+            with self._lock:
+                self._inflight.pop(dedupe_key, None)
+            try:
+                if error:
+                    self._update_pending(dedupe_key, "UPDATE generation_jobs SET status = 'failed', error = ?, updated_at = ?",
+                                         (json.dumps({"body": error[0], "status": error[1]}), time.time()))
+                else:
+                    self._update_pending(dedupe_key, "UPDATE generation_jobs SET status = 'succeeded', progress = 1, result = ?, updated_at = ?",
+                                         (json.dumps(data), time.time()))
+            except Exception as e:
+                print(f"Generation Job Save Error: {str(e)}")
+
+    def get(self, job_id, user_id):
+        rows, _ = self._execute(
+            "SELECT id, status, progress, result, error, created_at, updated_at FROM generation_jobs WHERE id = ? AND user_id = ?",
+            (job_id, user_id),
+        )
+        if not rows:
+            return None
+        row = rows[0]
+        job = {"jobId": row[0], "status": row[1], "progress": row[2], "createdAt": row[5], "updatedAt": row[6]}
+        if row[3] is not None:
+            job["result"] = json.loads(row[3])
+        if row[4] is not None:
+            job["error"] = json.loads(row[4])
+        return job
+
+    def recover(self):
+        """Claims queued/running jobs that no live worker has touched recently and re-runs them."""
+        now = time.time()
+        rows, _ = self._execute(
+            "SELECT id, kind, query, dedupe_key, owner, updated_at FROM generation_jobs WHERE status IN ('queued', 'running') AND updated_at < ?",
+            (now - self.stale_after,),
+        )
+        for job_id, kind, query, dedupe_key, owner, updated_at in rows:
+            if kind not in self.handlers:
+                continue
+            _, claimed = self._execute(
+                "UPDATE generation_jobs SET owner = ?, status = 'queued', updated_at = ? WHERE id = ? AND owner IS ? AND updated_at = ?",
+                (self.owner, now, job_id, owner, updated_at),
+            )
+            if claimed == 1:
+                print(f"Recovered generation job {job_id}.")
+                self._enqueue(job_id, kind, query, dedupe_key)
+
+    def heartbeat(self):
+        """Marks this process's pending jobs as alive so other workers leave them alone."""
+        self._execute("UPDATE generation_jobs SET updated_at = ? WHERE owner = ? AND status IN ('queued', 'running')", (time.time(), self.owner))
+
+    def purge(self):
+        """Deletes finished jobs, and the results they hold, once they are older than ``retention``."""
+        _, deleted = self._execute("DELETE FROM generation_jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?", (time.time() - self.retention,))
+        if deleted and deleted > 0:
+            print(f"Purged {deleted} finished generation jobs.")
+
+    def _recover_loop(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.heartbeat()
+                    self.recover()
+                    self.purge()
+            except Exception as e:
+                print(f"Generation Job Recovery Error: {str(e)}")
+            time.sleep(self.recover_interval)
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._inflight), "waiting_jobs": sum(len(g) for g in self._inflight.values()), "max_workers": self.max_workers}
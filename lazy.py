@@ -0,0 +1,34 @@
+"""Deferred construction of heavy module-level clients.
+
+``Lazy(factory)`` stands in for the object ``factory()`` returns and builds
+it on first attribute access. Importing the app, and so booting or recycling
+a worker, no longer pays for the HTTP session, the bcrypt cost lookup or
+NumPy until a request actually needs them.
+"""
+import threading
+
+
+class Lazy:
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    @property
+    def created(self):
+        return self._instance is not None
+
+    def get(self):
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    object.__setattr__(self, '_instance', self._factory())
+                instance = self._instance
+        return instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
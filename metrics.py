@@ -0,0 +1,174 @@
+"""Request-scoped timing and counters exposed in the Prometheus text format.
+
+Every request opens a trace; ``span(name)`` blocks inside it (model calls,
+database queries, password hashing) are timed into a histogram and also
+attached to the trace, so a slow request can be logged with a breakdown of
+where its time went. Spans outside a request are still counted in the
+histograms.
+
+Values are kept per process: with several gunicorn workers each scrape of
+``/metrics`` reports the worker that served it, labelled with its ``pid``.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _merge_labels(labels, extra):
+    return _label_text(tuple(labels) + tuple(extra))
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def add_collector(self, collect):
+        """``collect()`` returns ``[(name, labels_dict, value), ...]`` gauges, read at scrape time."""
+        self._collectors.append(collect)
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {"counts": list(h["counts"]), "sum": h["sum"], "count": h["count"]} for key, h in self._histograms.items()}
+        pid = (('pid', os.getpid()),)
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name in described:
+                return
+            described.add(name)
+            kind, text = self._help.get(name, (kind, ''))
+            if text:
+                lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append(f"{name}{_merge_labels(labels, pid)} {value}")
+
+        for (name, labels), histogram in sorted(histograms.items()):
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_merge_labels(labels, pid + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{_merge_labels(labels, pid + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{name}_sum{_merge_labels(labels, pid)} {histogram['sum']:.6f}")
+            lines.append(f"{name}_count{_merge_labels(labels, pid)} {histogram['count']}")
+
+        for collect in self._collectors:
+            try:
+                gauges = collect()
+            except Exception as e:
+                print(f"Metrics Collector Error: {str(e)}")
+                continue
+            for name, labels, value in gauges:
+                header(name, 'gauge')
+                lines.append(f"{name}{_merge_labels(tuple(sorted(labels.items())), pid)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+registry.describe('http_request_duration_seconds', 'histogram', 'Time spent serving a request, by route.')
+registry.describe('span_duration_seconds', 'histogram', 'Time spent in instrumented blocks such as model calls, database queries and password hashing.')
+registry.describe('upstream_tokens_total', 'counter', 'Tokens reported by the model provider.')
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def breakdown(self):
+        """Returns ``[(span, total_seconds, count), ...]``, slowest first."""
+        totals = {}
+        for name, duration in list(self.spans):
+            total, count = totals.get(name, (0.0, 0))
+            totals[name] = (total + duration, count + 1)
+        return sorted(((name, total, count) for name, (total, count) in totals.items()), key=lambda item: -item[1])
+
+
+def start_trace(name):
+    """Starts a trace that ``span`` blocks in the current context are attached to."""
+    trace = Trace(name)
+    _current_trace.set(trace)
+    return trace
+
+
+def end_trace():
+    _current_trace.set(None)
+
+
+@contextmanager
+def span(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        registry.observe('span_duration_seconds', duration, span=name, **labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append((name, duration))
+
+
+def record_usage(usage):
+    """Counts the ``usage`` block of a chat completion response against the current route."""
+    if not isinstance(usage, dict):
+        return
+    trace = _current_trace.get()
+    endpoint = trace.name if trace is not None else 'background'
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        if isinstance(usage.get(kind), int):
+            registry.inc('upstream_tokens_total', usage[kind], type=kind.split('_')[0], endpoint=endpoint)
+
+
+def format_breakdown(trace):
+    return ', '.join(f"{name} {total * 1000:.0f}ms x{count}" for name, total, count in trace.breakdown()) or 'no spans'
@@ -0,0 +1,161 @@
+"""Versioned schema migrations.
+
+Applied versions are recorded in ``schema_migrations`` and each step only
+runs once per database. Every step is also idempotent on its own, so a
+database created by the old ``init_db`` (which ran all of them on every
+start) upgrades cleanly and two overlapping runs cannot break anything.
+
+Migrations run once per deployment, from the Heroku release phase
+(``flask --app app migrate`` in the Procfile), never from the web workers.
+"""
+import json
+import time
+import zlib
+
+from ai_cache import CREATE_CACHE_TABLE, CREATE_CACHE_INDEX
+from auth_cache import CREATE_REVOCATIONS_TABLE
+from chat_sessions import CREATE_CHAT_TABLES
+from jobs import CREATE_JOBS_TABLE, CREATE_JOBS_INDEXES
+from password_hashing import CREATE_SETTINGS_TABLE
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at REAL NOT NULL
+    );"""
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def register(step):
+        MIGRATIONS.append((version, description, step))
+        return step
+    return register
+
+
+def add_column_if_missing(c, table, column, definition):
+    c.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in c.fetchall()]:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def backfill_saved_courses(c, batch_size=100):
+    """Compresses legacy saved_courses rows and fills in their summary columns."""
+    while True:
+        c.execute("SELECT id, course_data FROM saved_courses WHERE course_blob IS NULL LIMIT ?", (batch_size,))
+        rows = c.fetchall()
+        if not rows:
+            return
+        for row in rows:
+            try:
+                course = json.loads(row[1])
+            except (TypeError, ValueError):
+                course = {}
+            c.execute("UPDATE saved_courses SET course_description = ?, difficulty = ?, course_blob = ?, course_data = '' WHERE id = ?",
+                      (course.get('description'), course.get('difficulty'), zlib.compress((row[1] or '').encode('utf-8')), row[0]))
+
+
+@migration(1, "users and saved_courses tables")
+def create_core_tables(c):
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        full_name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        role TEXT DEFAULT 'user' NOT NULL
+    );""")
+
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS saved_courses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        course_title TEXT NOT NULL,
+        course_data TEXT NOT NULL,
+        saved_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+    );""")
+
+
+@migration(2, "user list indexes")
+def create_user_indexes(c):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at DESC, id DESC);")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_role_created ON users (role, created_at DESC, id DESC);")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_email_nocase ON users (email COLLATE NOCASE);")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_full_name_nocase ON users (full_name COLLATE NOCASE);")
+
+
+@migration(3, "compressed saved courses with summary columns")
+def compress_saved_courses(c):
+    add_column_if_missing(c, 'saved_courses', 'course_description', 'TEXT')
+    add_column_if_missing(c, 'saved_courses', 'difficulty', 'TEXT')
+    add_column_if_missing(c, 'saved_courses', 'course_blob', 'BLOB')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_saved_courses_user_saved ON saved_courses (user_id, saved_at DESC, id DESC);")
+    backfill_saved_courses(c)
+
+
+@migration(4, "token revocations")
+def create_revocations(c):
+    c.execute(CREATE_REVOCATIONS_TABLE)
+
+
+@migration(5, "chat sessions")
+def create_chat_tables(c):
+    for statement in CREATE_CHAT_TABLES:
+        c.execute(statement)
+
+
+@migration(6, "AI response cache")
+def create_cache_table(c):
+    c.execute(CREATE_CACHE_TABLE)
+    add_column_if_missing(c, 'ai_response_cache', 'title', 'TEXT')
+    c.execute(CREATE_CACHE_INDEX)
+
+
+@migration(7, "generation jobs")
+def create_jobs_table(c):
+    c.execute(CREATE_JOBS_TABLE)
+    for statement in CREATE_JOBS_INDEXES:
+        c.execute(statement)
+
+
+@migration(8, "app settings")
+def create_settings_table(c):
+    c.execute(CREATE_SETTINGS_TABLE)
+
+
+def applied_versions(db):
+    c = db.cursor()
+    c.execute(CREATE_MIGRATIONS_TABLE)
+    c.execute("SELECT version FROM schema_migrations")
+    versions = {row[0] for row in c.fetchall()}
+    db.commit()
+    return versions
+
+
+def migrate(db):
+    """Applies every pending migration in order and returns the versions that ran."""
+    done = applied_versions(db)
+    ran = []
+    for version, description, step in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+        c = db.cursor()
+        try:
+            step(c)
+            c.execute("INSERT OR IGNORE INTO schema_migrations(version, description, applied_at) VALUES(?, ?, ?)", (version, description, time.time()))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        print(f"✓ Applied migration {version}: {description}")
+        ran.append(version)
+    return ran
+
+
+def schema_version(db):
+    versions = applied_versions(db)
+    return max(versions) if versions else 0
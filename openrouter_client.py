@@ -0,0 +1,187 @@
+"""Shared HTTP client for the OpenRouter chat-completions API.
+
+One pooled ``requests.Session`` is reused by every worker thread so TLS
+connections are kept alive between calls. Each request has explicit
+connect/read timeouts, is retried with jittered exponential backoff on 429
+and 5xx responses (honouring ``Retry-After``), and goes through a circuit
+breaker that fails fast while the upstream is down.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling OpenRouter while the breaker is open."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"OpenRouter circuit is open; retry in {retry_after:.0f}s.")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures and lets a single
+    trial request through once ``reset_timeout`` seconds have passed."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or self._trial_in_flight:
+                raise CircuitOpenError(max(remaining, 0))
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                name = "closed"
+            elif self._trial_in_flight or time.monotonic() >= self._opened_at + self.reset_timeout:
+                name = "half_open"
+            else:
+                name = "open"
+            return {"state": name, "consecutive_failures": self._failures}
+
+
+def parse_retry_after(value):
+    """Returns the delay in seconds from a ``Retry-After`` header, or None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class OpenRouterClient:
+    def __init__(self, api_key, base_url="https://openrouter.ai/api/v1", connect_timeout=5.0, read_timeout=120.0,
+                 pool_size=10, max_retries=3, backoff_base=0.5, backoff_max=8.0, max_retry_after=30.0, breaker=None):
+        self.api_key = api_key
+        self.url = base_url.rstrip('/') + "/chat/completions"
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {api_key}"})
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._adapter = adapter
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = {"requests": 0, "retries": 0, "failures": 0, "short_circuited": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _fail(self):
+        self.breaker.record_failure()
+        self._count("failures")
+
+    def _backoff(self, attempt, response=None):
+        retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post_chat(self, payload, stream=False):
+        """POSTs a chat-completions payload and returns the final ``requests.Response``.
+
+        Retries happen only before a response body is consumed, so streamed
+        responses are never replayed half-way. Raises ``CircuitOpenError``,
+        ``requests.exceptions.Timeout`` or ``requests.exceptions.ConnectionError``
+        when no usable response could be obtained.
+        """
+        try:
+            self.breaker.before_request()
+        except CircuitOpenError:
+            self._count("short_circuited")
+            raise
+
+        with self._lock:
+            self._in_flight += 1
+            self._counters["requests"] += 1
+        try:
+            attempt = 0
+            while True:
+                try:
+                    response = self.session.post(self.url, json=payload, timeout=self.timeout, stream=stream)
+                except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                    if attempt >= self.max_retries:
+                        self._fail()
+                        raise
+                    delay = self._backoff(attempt)
+                except requests.exceptions.RequestException:
+                    self._fail()
+                    raise
+                else:
+                    if response.status_code not in RETRY_STATUSES:
+                        self.breaker.record_success()
+                        return response
+                    delay = self._backoff(attempt, response)
+                    if attempt >= self.max_retries or delay > self.max_retry_after:
+                        if response.status_code >= 500:
+                            self._fail()
+                        else:
+                            self.breaker.record_success()
+                        return response
+                    response.close()
+
+                self._count("retries")
+                time.sleep(delay)
+                attempt += 1
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = self._in_flight
+        stats["pool_size"] = self.pool_size
+        stats["connect_timeout"], stats["read_timeout"] = self.timeout
+        try:
+            pools = list(self._adapter.poolmanager.pools._container.values())
+            stats["connections_opened"] = sum(pool.num_connections for pool in pools)
+        except AttributeError:
+            stats["connections_opened"] = None
+        stats["circuit"] = self.breaker.state()
+        return stats
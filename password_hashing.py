@@ -0,0 +1,129 @@
+"""Bounded executor for bcrypt hashing.
+
+bcrypt burns tens to hundreds of milliseconds of CPU per call. Hashes run
+on a small dedicated pool with a queue limit, so a burst of logins is
+turned away with a fast 503 instead of tying up every web worker. The work
+factor is configurable or calibrated once per deployment against a target
+latency and stored in ``app_settings``, and stored hashes with a lower cost
+are upgraded on login.
+"""
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BCRYPT_COST_PATTERN = re.compile(r'^\$2[abxy]?\$(\d{2})\$')
+
+CREATE_SETTINGS_TABLE = """
+    CREATE TABLE IF NOT EXISTS app_settings (
+        name TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    );"""
+
+
+class HashingOverloadedError(Exception):
+    """Raised when the hashing queue is full."""
+
+
+def _executor(max_workers):
+    # Under gevent, standard threads are greenlets and a CPU-bound hash would
+    # block the whole hub, so use gevent's pool of real OS threads instead.
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+            return NativeThreadPoolExecutor(max_workers=max_workers)
+    except ImportError:
+        pass
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hash')
+
+
+def hash_cost(pw_hash):
+    match = BCRYPT_COST_PATTERN.match(pw_hash or '')
+    return int(match.group(1)) if match else None
+
+
+def calibrate_rounds(bcrypt, target_ms, min_rounds=10, max_rounds=14, samples=5):
+    """Returns the highest cost whose hash time stays within ``target_ms``.
+
+    Each extra round doubles the work, so the median of a few timings at
+    ``min_rounds`` is enough to estimate the rest without one noisy sample
+    flipping the answer.
+    """
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        bcrypt.generate_password_hash('calibration', min_rounds)
+        timings.append((time.perf_counter() - started) * 1000)
+    elapsed_ms = statistics.median(timings)
+    rounds = min_rounds
+    while rounds < max_rounds and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    return rounds
+
+
+def load_rounds(db):
+    """Returns the cost stored by ``store_rounds``, or None."""
+    c = db.cursor()
+    c.execute("SELECT value FROM app_settings WHERE name = 'bcrypt_rounds'")
+    row = c.fetchone()
+    return int(row[0]) if row else None
+
+
+def store_rounds(db, rounds):
+    c = db.cursor()
+    c.execute("INSERT OR REPLACE INTO app_settings(name, value, updated_at) VALUES('bcrypt_rounds', ?, ?)", (str(rounds), time.time()))
+    db.commit()
+
+
+class PasswordHasher:
+    def __init__(self, bcrypt, rounds=12, max_workers=2, max_queue=16):
+        self._bcrypt = bcrypt
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = _executor(max_workers)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._counters = {"hashes": 0, "checks": 0, "rejected": 0, "rehashes": 0}
+        self._pending = 0
+
+    def _run(self, counter, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._counters["rejected"] += 1
+            raise HashingOverloadedError("Password hashing queue is full.")
+        with self._lock:
+            self._counters[counter] += 1
+            self._pending += 1
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run("hashes", self._bcrypt.generate_password_hash, password, self.rounds).decode('utf-8')
+
+    def check(self, pw_hash, password):
+        return self._run("checks", self._bcrypt.check_password_hash, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        cost = hash_cost(pw_hash)
+        # Only upgrade: workers must never take turns rewriting each other's hashes.
+        return cost is not None and cost < self.rounds
+
+    def record_rehash(self):
+        with self._lock:
+            self._counters["rehashes"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["pending"] = self._pending
+        stats.update({"rounds": self.rounds, "max_workers": self.max_workers, "max_queue": self.max_queue})
+        return stats
@@ -0,0 +1,155 @@
+"""Prompt templates, parsed once at import.
+
+The course prompt alone is several kilobytes; ``PromptTemplate`` splits a
+``str.format``-style template into literal text and named fields up front,
+so building a prompt per request is a single join instead of re-evaluating
+a large f-string.
+"""
+import string
+
+
+class PromptTemplate:
+    """A template whose ``{name}`` fields are filled by ``render(**values)``; ``{{``/``}}`` are literal braces.
+
+    Keyword arguments given here are substituted once, at construction.
+    """
+
+    def __init__(self, text, **constants):
+        self.fields = set()
+        parts = []
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            if literal:
+                parts.append((True, literal))
+            if field is None:
+                continue
+            if spec or conversion or not field.isidentifier():
+                raise ValueError(f"Unsupported prompt field '{field}'.")
+            if field in constants:
+                parts.append((True, str(constants[field])))
+            else:
+                parts.append((False, field))
+                self.fields.add(field)
+        self._parts = []
+        for is_literal, value in parts:
+            if is_literal and self._parts and self._parts[-1][0]:
+                self._parts[-1] = (True, self._parts[-1][1] + value)
+            else:
+                self._parts.append((is_literal, value))
+
+    def render(self, **values):
+        return ''.join(value if is_literal else str(values[value]) for is_literal, value in self._parts)
+
+
+COURSE_PROMPT = PromptTemplate("""
+        You are an expert course creator who ONLY responds in valid JSON.
+        A user wants a detailed course about: "{user_query}".
+        Create a comprehensive course outline with the following JSON structure. Each module must contain 8 chapters, and each chapter must contain at least 4 pages. The 'content' for each page should be a detailed, educational paragraph.
+
+        {{
+        "title": "Course Title", "description": "Engaging 2-3 sentence description.",
+        "duration": "e.g., '8 Weeks'", "difficulty": "Beginner, Intermediate, or Advanced",
+        "startingSalary": "Realistic starting salary in INR (e.g., '₹4L - ₹6L / yr')",
+        "skills": ["5-7 relevant skills"],
+        "modules": [
+            {{
+            "title": "Module 1: [Module Title]", "description": "Brief overview of the module.",
+            "chapters": [
+                {{
+                "title": "Chapter 1.1: [Chapter Title]",
+                "pages": [
+                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
+                ]
+                }},
+                {{
+                "title": "Chapter 1.2: [Chapter Title]",
+                "pages": [
+                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
+                ]
+                }},
+                {{
+                "title": "Chapter 1.3: [Chapter Title]",
+                "pages": [
+                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
+                ]
+                }},
+                {{
+                "title": "Chapter 1.4: [Chapter Title]",
+                "pages": [
+                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
+                ]
+                }},
+                {{
+                "title": "Chapter 1.5: [Chapter Title]",
+                "pages": [
+                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
+                ]
+                }},
+                {{
+                "title": "Chapter 1.6: [Chapter Title]",
+                "pages": [
+                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
+                ]
+                }},
+                {{
+                "title": "Chapter 1.7: [Chapter Title]",
+                "pages": [
+                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
+                ]
+                }},
+                {{
+                "title": "Chapter 1.8: [Chapter Title]",
+                "pages": [
+                    {{"title": "Page 1: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 2: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 3: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}},
+                    {{"title": "Page 4: [Page Title]", "content": "Detailed, paragraph-form educational content for this page."}}
+                ]
+                }}
+              ]
+            }}
+          ]
+        }}
+    """)
+
+CAREER_PATH_PROMPT = PromptTemplate("""
+        You are a career path expert for the Indian job market who ONLY responds in valid JSON.
+        Generate a career progression for "{user_query}".
+        The JSON must follow this structure:
+        {{
+        "title": "Career Path for {user_query}", "description": "Brief 2-3 sentence description.",
+        "flowchart": {{"roles": [ {{"id": 1, "title": "Job Title", "salary": "₹XL - ₹YL / yr", "stage": "Entry Level, Mid Career, or Late Career"}} ] }}
+        }}
+        Include 8-12 total roles distributed across the three stages.
+    """)
+
+CHAT_SYSTEM_PROMPT = """
+        You are Course2Career Assistant. Your #1 rule is to NEVER mention or suggest external websites like Coursera or Udemy. Your entire focus is on the tools available on THIS website.
+
+        **Your Task:**
+        1. Give a direct, concise answer to the user's question.
+        2. If the question is about learning a skill or a career, add this EXACT sentence to the end of your response: "For a detailed plan, use the **Course Search** and **Career Path Visualizer** tools on our site."
+        3. Use simple HTML for formatting: `<p>`, `<strong>`, `<ul>`, `<li>`. Do NOT include `<html>` or `<body>` tags.
+
+        Remember: Do not mention any other websites.
+    """
@@ -0,0 +1,282 @@
+"""Token-bucket rate limiting and concurrency caps for the AI endpoints.
+
+Bucket and in-flight state lives in process memory by default. With
+``SQLiteStore`` it lives in a local SQLite file instead, so every gunicorn
+worker on the same dyno shares the same limits.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class MemoryStore:
+    """Keeps limiter state in process memory.
+
+    Buckets that have refilled to capacity and keys with no live slots are
+    dropped every ``prune_interval`` seconds, so memory does not grow with
+    every distinct IP and user ever seen.
+    """
+
+    def __init__(self, prune_interval=60):
+        self.prune_interval = prune_interval
+        self._buckets = {}
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._pruned_at = time.monotonic()
+
+    def _prune_locked(self, now):
+        if now - self._pruned_at < self.prune_interval:
+            return
+        self._pruned_at = now
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if bucket[0] + (now - bucket[1]) * bucket[3] < bucket[2]
+        }
+        self._slots = {
+            key: live for key, live in ((key, {slot: expires for slot, expires in slots.items() if expires > now}) for key, slots in self._slots.items())
+            if live
+        }
+
+    def consume(self, key, capacity, refill_per_second, cost=1.0):
+        now = time.monotonic()
+        with self._lock:
+            self._prune_locked(now)
+            tokens, updated_at = self._buckets.get(key, (capacity, now))[:2]
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now, capacity, refill_per_second)
+                return True, 0.0
+            self._buckets[key] = (tokens, now, capacity, refill_per_second)
+            return False, (cost - tokens) / refill_per_second
+
+    def refund(self, key, capacity, cost=1.0):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._buckets[key] = (min(capacity, bucket[0] + cost),) + bucket[1:]
+
+    def acquire_slot(self, key, limit, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._prune_locked(now)
+            slots = {slot: expires for slot, expires in self._slots.get(key, {}).items() if expires > now}
+            if len(slots) >= limit:
+                self._slots[key] = slots
+                return None
+            slot_id = uuid.uuid4().hex
+            slots[slot_id] = now + ttl
+            self._slots[key] = slots
+            return slot_id
+
+    def release_slot(self, key, slot_id):
+        with self._lock:
+            slots = self._slots.get(key)
+            if slots is not None:
+                slots.pop(slot_id, None)
+                if not slots:
+                    del self._slots[key]
+
+    def size(self):
+        with self._lock:
+            return {"buckets": len(self._buckets), "slot_keys": len(self._slots)}
+
+
+class SQLiteStore:
+    """Shares limiter state between processes through a local SQLite file.
+
+    Each read-modify-write runs in a ``BEGIN IMMEDIATE`` transaction so
+    concurrent workers cannot both spend the last token. In-flight slots are
+    leases with an expiry, so a crashed worker cannot leak them forever. Like
+    ``MemoryStore``, buckets that have refilled to capacity and expired slots
+    are deleted every ``prune_interval`` seconds.
+    """
+
+    def __init__(self, path, prune_interval=60):
+        self.path = path
+        self.prune_interval = prune_interval
+        self._local = threading.local()
+        self._pruned_at = time.monotonic()
+        self._prune_lock = threading.Lock()
+        with self._transaction() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, capacity REAL, refill REAL)")
+            columns = [row[1] for row in db.execute("PRAGMA table_info(rate_buckets)").fetchall()]
+            for column in ('capacity', 'refill'):
+                if column not in columns:
+                    db.execute(f"ALTER TABLE rate_buckets ADD COLUMN {column} REAL")
+            db.execute("CREATE TABLE IF NOT EXISTS rate_slots (key TEXT NOT NULL, slot_id TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_rate_slots_key ON rate_slots (key, expires_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_rate_slots_expires ON rate_slots (expires_at)")
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    class _Transaction:
+        def __init__(self, db):
+            self.db = db
+
+        def __enter__(self):
+            self.db.execute("BEGIN IMMEDIATE")
+            return self.db
+
+        def __exit__(self, exc_type, exc, tb):
+            self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+    def _transaction(self):
+        return self._Transaction(self._db())
+
+    def _prune(self):
+        with self._prune_lock:
+            if time.monotonic() - self._pruned_at < self.prune_interval:
+                return
+            self._pruned_at = time.monotonic()
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("DELETE FROM rate_buckets WHERE refill IS NOT NULL AND tokens + (? - updated_at) * refill >= capacity", (now,))
+            db.execute("DELETE FROM rate_slots WHERE expires_at <= ?", (now,))
+
+    def size(self):
+        db = self._db()
+        return {"buckets": db.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0],
+                "slot_keys": db.execute("SELECT COUNT(DISTINCT key) FROM rate_slots").fetchone()[0]}
+
+    def consume(self, key, capacity, refill_per_second, cost=1.0):
+        self._prune()
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated_at = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(now - updated_at, 0) * refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            db.execute("INSERT OR REPLACE INTO rate_buckets(key, tokens, updated_at, capacity, refill) VALUES(?, ?, ?, ?, ?)",
+                       (key, tokens, now, capacity, refill_per_second))
+        return (True, 0.0) if allowed else (False, (cost - tokens) / refill_per_second)
+
+    def refund(self, key, capacity, cost=1.0):
+        with self._transaction() as db:
+            db.execute("UPDATE rate_buckets SET tokens = MIN(?, tokens + ?) WHERE key = ?", (capacity, cost, key))
+
+    def acquire_slot(self, key, limit, ttl):
+        self._prune()
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("DELETE FROM rate_slots WHERE key = ? AND expires_at <= ?", (key, now))
+            in_flight = db.execute("SELECT COUNT(*) FROM rate_slots WHERE key = ?", (key,)).fetchone()[0]
+            if in_flight >= limit:
+                return None
+            slot_id = uuid.uuid4().hex
+            db.execute("INSERT INTO rate_slots(key, slot_id, expires_at) VALUES(?, ?, ?)", (key, slot_id, now + ttl))
+        return slot_id
+
+    def release_slot(self, key, slot_id):
+        with self._transaction() as db:
+            db.execute("DELETE FROM rate_slots WHERE slot_id = ?", (slot_id,))
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RateLimiter:
+    """Applies per-scope rules of the form::
+
+        {"user": (capacity, refill_per_second), "ip": (capacity, refill_per_second),
+         "concurrent": max_in_flight_per_user}
+
+    Any part of a rule may be omitted.
+    """
+
+    def __init__(self, store, rules, slot_ttl=600):
+        self.store = store
+        self.rules = rules
+        self.slot_ttl = slot_ttl
+        self._lock = threading.Lock()
+        self._counters = {"allowed": 0, "limited": 0, "concurrency_limited": 0, "refunded": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def check(self, scope, user_id, ip):
+        """Spends one token from the user and IP buckets and reserves an in-flight slot.
+
+        Returns a ``release(refund=False)`` callable that frees the slot and,
+        with ``refund``, gives the tokens back; or raises
+        ``RateLimitExceeded``, in which case nothing stays spent. Store
+        failures are logged and let the request through.
+        """
+        rule = self.rules.get(scope, {})
+        spent = []
+        try:
+            for kind, identity in (("user", user_id), ("ip", ip)):
+                if kind not in rule or identity is None:
+                    continue
+                capacity, refill = rule[kind]
+                key = f"{scope}:{kind}:{identity}"
+                allowed, retry_after = self.store.consume(key, capacity, refill)
+                if not allowed:
+                    self._count("limited")
+                    raise RateLimitExceeded("Too many requests. Please slow down.", retry_after)
+                spent.append((key, capacity))
+
+            slot = None
+            if "concurrent" in rule and user_id is not None:
+                key = f"{scope}:inflight:{user_id}"
+                slot_id = self.store.acquire_slot(key, rule["concurrent"], self.slot_ttl)
+                if slot_id is None:
+                    self._count("concurrency_limited")
+                    raise RateLimitExceeded("You already have the maximum number of requests in progress.", 5)
+                slot = (key, slot_id)
+        except RateLimitExceeded:
+            self._refund(spent)
+            raise
+        except Exception as e:
+            print(f"Rate Limiter Error: {str(e)}")
+            self._count("errors")
+            return lambda refund=False: None
+
+        self._count("allowed")
+        def release(refund=False):
+            if slot is not None:
+                self._release(*slot)
+            if refund:
+                self._count("refunded")
+                self._refund(spent)
+        return release
+
+    def _refund(self, spent):
+        for key, capacity in spent:
+            try:
+                self.store.refund(key, capacity)
+            except Exception as e:
+                print(f"Rate Limiter Refund Error: {str(e)}")
+
+    def _release(self, key, slot_id):
+        try:
+            self.store.release_slot(key, slot_id)
+        except Exception as e:
+            print(f"Rate Limiter Release Error: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, store=type(self.store).__name__)
+        if hasattr(self.store, 'size'):
+            stats.update(self.store.size())
+        return stats
+
+
+def create_store(kind, path=None):
+    if kind == 'sqlite':
+        return SQLiteStore(path or os.path.join('/tmp', 'course2career-ratelimit.db'))
+    return MemoryStore()
@@ -0,0 +1,247 @@
+"""Near-duplicate matching for generation requests.
+
+"python", "Python programming" and "learn python from scratch" all ask for
+the same course. Previously generated queries and titles are indexed as
+hashed character n-gram TF-IDF vectors; a new query is compared against
+them with a single NumPy matrix-vector product, and when the best cosine
+similarity clears the threshold the stored response is served instead of
+calling the model.
+"""
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+FILLER_WORDS = {
+    'a', 'an', 'the', 'to', 'of', 'for', 'in', 'and', 'with', 'from', 'on', 'i', 'me', 'my', 'want', 'how',
+    'learn', 'learning', 'course', 'courses', 'scratch', 'beginner', 'beginners', 'complete', 'guide',
+    'introduction', 'intro', 'become', 'basics', 'fundamentals', 'career', 'path',
+}
+
+
+def clean_text(text):
+    words = re.findall(r'[a-z0-9+#.]+', str(text).lower())
+    kept = [word for word in words if word not in FILLER_WORDS]
+    return ' '.join(kept or words)
+
+
+class SimilarityIndex:
+    """Hashed char n-gram TF-IDF index over previously cached generations.
+
+    ``connection()`` lends a DB connection for refreshing from the
+    ``ai_response_cache`` table, and ``key_for(endpoint, query)`` rebuilds a
+    cache key so rows produced by another model or prompt version are
+    skipped. The threshold and enabled flag are shared by every worker
+    through ``app_settings`` and reloaded on each refresh; the constructor
+    values are only defaults.
+    """
+
+    def __init__(self, connection, key_for, threshold=0.8, dimensions=2048, ngram_range=(3, 4), max_entries=4000, refresh_interval=300):
+        self._connection = connection
+        self._key_for = key_for
+        self.threshold = threshold
+        self.enabled = True
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._swap(*self._build([]))
+        self._loaded_at = 0.0
+        self._refreshing = False
+        self._counters = {"lookups": 0, "matches": 0, "refreshes": 0}
+
+    def _swap(self, entries, tf, df, weighted):
+        # ``_tf`` may have spare rows past ``len(self._entries)``; once full it is a ring with ``_next`` as the oldest slot.
+        self._entries = entries
+        self._seen = set(entries)
+        self._tf = tf
+        self._df = df
+        self._weighted = weighted
+        self._next = 0
+
+    def _vectorize(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        padded = f" {clean_text(text)} "
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            for i in range(len(padded) - n + 1):
+                vector[zlib.crc32(padded[i:i + n].encode('utf-8')) % self.dimensions] += 1.0
+        return vector
+
+    @staticmethod
+    def _idf(df, count):
+        return np.log((1.0 + count) / (1.0 + df)) + 1.0
+
+    @classmethod
+    def _weigh(cls, tf, df, count):
+        weighted = tf[:count] * cls._idf(df, count)
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        return weighted / np.maximum(norms, 1e-9)
+
+    def _build(self, entries):
+        """Returns the ``_swap`` arguments for ``entries``; runs without the lock."""
+        if entries:
+            tf = np.stack([self._vectorize(text) for _, text, _ in entries])
+        else:
+            tf = np.zeros((0, self.dimensions), dtype=np.float32)
+        df = (tf > 0).sum(axis=0).astype(np.float32)
+        return entries, tf, df, self._weigh(tf, df, len(entries))
+
+    def _add_locked(self, entry, tf):
+        if entry in self._seen:
+            return
+        count = len(self._entries)
+        if count < self.max_entries:
+            if count == len(self._tf):
+                # Grow geometrically so adding a row does not copy the whole matrix each time.
+                grown = np.zeros((min(self.max_entries, max(64, count * 2)), self.dimensions), dtype=np.float32)
+                grown[:count] = self._tf[:count]
+                self._tf = grown
+            slot = count
+            self._entries.append(entry)
+        else:
+            slot = self._next
+            self._df -= (self._tf[slot] > 0)
+            self._seen.discard(self._entries[slot])
+            self._entries[slot] = entry
+            self._next = (slot + 1) % self.max_entries
+        self._tf[slot] = tf
+        self._df += (tf > 0)
+        self._seen.add(entry)
+        self._weighted = None
+
+    def add(self, endpoint, query, title, cache_key):
+        texts = [str(query).strip().lower()] + ([str(title).strip().lower()] if title else [])
+        vectors = [((endpoint, text, cache_key), self._vectorize(text)) for text in texts if text]
+        with self._lock:
+            for entry, tf in vectors:
+                self._add_locked(entry, tf)
+
+    def _load_settings(self, db):
+        c = db.cursor()
+        c.execute("SELECT name, value FROM app_settings WHERE name IN ('similarity_threshold', 'similarity_enabled')")
+        settings = {row[0]: row[1] for row in c.fetchall()}
+        if 'similarity_threshold' in settings:
+            self.threshold = float(settings['similarity_threshold'])
+        if 'similarity_enabled' in settings:
+            self.enabled = settings['similarity_enabled'] == '1'
+
+    def load_settings(self):
+        """Reloads the shared threshold and enabled flag from ``app_settings``."""
+        try:
+            with self._connection() as db:
+                self._load_settings(db)
+        except Exception as e:
+            print(f"Similarity Settings Load Error: {str(e)}")
+
+    def save_settings(self, threshold=None, enabled=None):
+        """Stores the given settings in ``app_settings`` for every worker and applies them here."""
+        values = []
+        if threshold is not None:
+            values.append(('similarity_threshold', str(threshold)))
+        if enabled is not None:
+            values.append(('similarity_enabled', '1' if enabled else '0'))
+        with self._connection() as db:
+            c = db.cursor()
+            for name, value in values:
+                c.execute("INSERT OR REPLACE INTO app_settings(name, value, updated_at) VALUES(?, ?, ?)", (name, value, time.time()))
+            db.commit()
+        if threshold is not None:
+            self.threshold = threshold
+        if enabled is not None:
+            self.enabled = bool(enabled)
+
+    def refresh(self, force=False):
+        """Reloads entries from ``ai_response_cache`` at most every ``refresh_interval`` seconds.
+
+        The new matrix is built without holding the lock and swapped in at the
+        end, so searches keep using the old one meanwhile.
+        """
+        with self._lock:
+            if not force and time.monotonic() - self._loaded_at < self.refresh_interval:
+                return
+            self._loaded_at = time.monotonic()
+        try:
+            with self._connection() as db:
+                self._load_settings(db)
+                c = db.cursor()
+                c.execute("SELECT cache_key, endpoint, query, title FROM ai_response_cache WHERE expires_at > ? ORDER BY last_used_at DESC LIMIT ?",
+                          (time.time(), self.max_entries // 2))
+                rows = [tuple(row) for row in c.fetchall()]
+        except Exception as e:
+            print(f"Similarity Index Refresh Error: {str(e)}")
+            return
+        entries, seen = [], set()
+        for cache_key, endpoint, query, title in reversed(rows):
+            if self._key_for(endpoint, query) != cache_key:
+                continue
+            for text in (query, str(title).strip().lower() if title else None):
+                if text and (endpoint, text, cache_key) not in seen:
+                    seen.add((endpoint, text, cache_key))
+                    entries.append((endpoint, text, cache_key))
+        built = self._build(entries[-self.max_entries:])
+        with self._lock:
+            self._swap(*built)
+            self._counters["refreshes"] += 1
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._loaded_at < self.refresh_interval:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name='similarity-refresh', daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def search(self, endpoint, query, limit=5):
+        """Returns up to ``limit`` ``{"cacheKey", "text", "score"}`` matches, best first.
+
+        A stale index is refreshed by a background thread; until it finishes
+        the search runs against the entries already loaded.
+        """
+        self._refresh_in_background()
+        query_vector = self._vectorize(query)
+        with self._lock:
+            count = len(self._entries)
+            if not count:
+                return []
+            if self._weighted is None:
+                self._weighted = self._weigh(self._tf, self._df, count)
+            query_vector = query_vector * self._idf(self._df, count)
+            norm = np.linalg.norm(query_vector)
+            if norm == 0:
+                return []
+            scores = self._weighted @ (query_vector / norm)
+            mask = np.array([entry[0] == endpoint for entry in self._entries])
+            scores = np.where(mask, scores, -1.0)
+            order = np.argsort(-scores)[:limit]
+            return [
+                {"cacheKey": self._entries[i][2], "text": self._entries[i][1], "score": round(float(scores[i]), 4)}
+                for i in order if scores[i] > 0
+            ]
+
+    def lookup(self, endpoint, query):
+        """Returns the best match at or above the threshold, or None."""
+        # Keep refreshing while disabled, so a worker picks up being turned back on.
+        self._refresh_in_background()
+        if not self.enabled:
+            return None
+        matches = self.search(endpoint, query, limit=1)
+        with self._lock:
+            self._counters["lookups"] += 1
+            if matches and matches[0]["score"] >= self.threshold:
+                self._counters["matches"] += 1
+                return matches[0]
+        return None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), threshold=self.threshold, enabled=self.enabled,
+                        dimensions=self.dimensions, max_entries=self.max_entries, refreshing=self._refreshing)